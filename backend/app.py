@@ -1,11 +1,31 @@
+import time
+
+# Measure startup from the first import
+APP_IMPORT_STARTED = time.perf_counter()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
 import traceback
-from datetime import datetime
+import hashlib
+import itertools
+import multiprocessing
+from datetime import datetime, timedelta
 from bson import json_util
-from services.youtube_service import fetch_video_info, fetch_video_comments
-from services.nlp_service import analyze_emotions
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from services.youtube_service import fetch_video_info, iter_video_comment_pages
+from services.nlp_service import analyze_emotions, prediction_cache, get_inference_pool, ACTIVE_MODELS, MODEL_LABELS
+from services.model_registry import registry
+from services.prediction_cache import get_persistent_store
+from services.job_queue import create_job_queue
+from services.pipeline import run_pipeline
+from services.quota import quota_limiter
+from services.pagination import CURSOR_SORT_FIELDS, InvalidCursorError, keyset_sort, encode_cursor, decode_cursor, keyset_filter
+from services.response_cache import response_cache
+from services.single_flight import SingleFlight
+from services.search import InvalidSearchError, search_comments
+from services.video_stats import STATS_FIELDS, rollup_delta, apply_delta, get_video_stats, emotion_stats, emotion_timeline
 from config.mongodb import get_database, setup_indexes
 from dotenv import load_dotenv
 
@@ -18,13 +38,34 @@ CORS(app, resources={
     r"/*": {
         "origins": ["http://localhost:3000", "http://localhost:5173"],
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type", "If-None-Match"],
+        "expose_headers": ["ETag"]
     }
 })
 
 # MongoDB connection
 db = get_database()
 
+# Incremental refresh settings
+COMMENTS_STALE_SECONDS = int(os.getenv('COMMENTS_STALE_SECONDS', 600))
+MAX_COMMENTS = int(os.getenv('MAX_COMMENTS', 100))
+
+# Number of comment upserts sent per bulk write
+SAVE_CHUNK_SIZE = int(os.getenv('SAVE_CHUNK_SIZE', 500))
+
+# One ingestion per video across processes, coordinated through leases in ingest_leases
+single_flight = SingleFlight(
+    db.ingest_leases,
+    ttl_seconds=int(os.getenv('INGEST_LEASE_SECONDS', 300)),
+    poll_seconds=float(os.getenv('INGEST_LEASE_POLL_SECONDS', 1.0))
+)
+
+# Attach the persistent prediction cache tier, if configured
+prediction_cache.persistent = get_persistent_store(db)
+
+# Count the daily YouTube quota in MongoDB, shared by all server processes
+quota_limiter.collection = db.youtube_quota
+
 def serialize_mongo_doc(doc):
     """Convert MongoDB document to JSON-serializable format."""
     if doc is None:
@@ -38,12 +79,15 @@ def serialize_mongo_doc(doc):
     return doc
 
 def save_video(video_data):
-    """Save or update video information in MongoDB."""
+    """Save or update video information in MongoDB.
+
+    lastAnalyzed is left to mark_video_synced, so a video whose first comment
+    sync fails stays stale instead of looking fresh with no comments.
+    """
     try:
-        video_data['lastAnalyzed'] = datetime.utcnow()
         return db.videos.update_one(
             {'videoId': video_data['videoId']},
-            {'$set': video_data},
+            {'$set': video_data, '$inc': {'cacheVersion': 1}},
             upsert=True
         )
     except Exception as e:
@@ -51,102 +95,376 @@ def save_video(video_data):
         traceback.print_exc()
         raise
 
-def save_comments(video_id, comments):
-    try:
-        if not comments:
-            print("No comments to save")
-            return
+def save_comments(video_id, comments, chunk_size=None):
+    """Upsert comments in unordered bulk writes and return a summary of the result.
 
-        # Add videoId to each comment
-        for comment in comments:
-            comment['videoId'] = video_id
+    A failing chunk is reported in the summary instead of aborting the remaining chunks.
+    The video's emotion rollup is updated with the changes of every written comment.
+    """
+    chunk_size = chunk_size or SAVE_CHUNK_SIZE
+    summary = {'inserted': 0, 'modified': 0, 'matched': 0, 'failed': 0, 'errors': []}
 
-        # Insert comments one by one instead of bulk write
-        for comment in comments:
-            db.comments.update_one(
+    if not comments:
+        print("No comments to save")
+        return summary
+
+    for start in range(0, len(comments), chunk_size):
+        chunk = comments[start:start + chunk_size]
+        operations = []
+        for comment in chunk:
+            comment['videoId'] = video_id
+            operations.append(UpdateOne(
                 {'commentId': comment['commentId']},
                 {'$set': comment},
                 upsert=True
+            ))
+
+        # Stored versions of these comments, so reclassified ones move between emotions
+        previous = {
+            doc['commentId']: doc
+            for doc in db.comments.find(
+                {'videoId': video_id, 'commentId': {'$in': [c['commentId'] for c in chunk]}},
+                STATS_FIELDS
             )
-        print(f"Successfully saved {len(comments)} comments")
+        }
+        written = chunk
+
+        try:
+            result = db.comments.bulk_write(operations, ordered=False)
+            summary['inserted'] += result.upserted_count
+            summary['modified'] += result.modified_count
+            summary['matched'] += result.matched_count
+        except BulkWriteError as e:
+            details = e.details
+            write_errors = details.get('writeErrors', [])
+            failed_indexes = {err.get('index') for err in write_errors}
+            written = [c for i, c in enumerate(chunk) if i not in failed_indexes]
+            summary['inserted'] += details.get('nUpserted', 0)
+            summary['modified'] += details.get('nModified', 0)
+            summary['matched'] += details.get('nMatched', 0)
+            summary['failed'] += len(write_errors)
+            summary['errors'].append({
+                'chunk': start // chunk_size,
+                'failed': len(write_errors),
+                'messages': [err.get('errmsg') for err in write_errors[:5]]
+            })
+            print(f"Error saving comment chunk {start // chunk_size}: {len(write_errors)} failed writes")
+        except Exception as e:
+            summary['failed'] += len(chunk)
+            summary['errors'].append({
+                'chunk': start // chunk_size,
+                'failed': len(chunk),
+                'messages': [str(e)]
+            })
+            print(f"Error saving comment chunk {start // chunk_size}: {str(e)}")
+            traceback.print_exc()
+            continue
+
+        try:
+            apply_delta(db, video_id, rollup_delta(previous, written))
+        except Exception as e:
+            # Rollups are derived data; python -m services.video_stats repairs them
+            print(f"Error updating emotion rollup for {video_id}: {str(e)}")
+            traceback.print_exc()
+
+    # Bumped after the writes, so responses cached under the new version include them
+    if summary['inserted'] or summary['modified']:
+        bump_cache_version(video_id)
+
+    print(f"Saved comments: {summary['inserted']} inserted, {summary['modified']} modified, "
+          f"{summary['failed']} failed")
+    return summary
+
+def bump_cache_version(video_id):
+    """Invalidate the video's cached responses by moving them to a new version."""
+    try:
+        db.videos.update_one({'videoId': video_id}, {'$inc': {'cacheVersion': 1}})
     except Exception as e:
-        print(f"Error saving comments: {str(e)}")
+        print(f"Error bumping cache version for {video_id}: {str(e)}")
         traceback.print_exc()
-        raise e
+
+def text_hash(text):
+    """Hash comment text so edited comments can be detected."""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def split_unanalyzed_comments(video_id, comments):
+    """Split comments into those to analyze (new, edited, or whose analysis failed
+    last time) and unchanged ones, which are saved without being classified again
+    so their like counts and author details stay current.
+    """
+    if not comments:
+        return [], []
+
+    for comment in comments:
+        comment['textHash'] = text_hash(comment['text'])
+
+    stored = db.comments.find(
+        {'videoId': video_id, 'commentId': {'$in': [c['commentId'] for c in comments]}},
+        {'_id': 0, 'commentId': 1, 'textHash': 1, 'emotion': 1, 'emotionAnalysis.modelVersion': 1}
+    )
+    # Failed predictions are stored as 'unknown'; they get another try on the next sync
+    analyzed = {
+        doc['commentId']: doc.get('textHash')
+        for doc in stored
+        if doc.get('emotion') not in (None, 'unknown') and doc.get('emotionAnalysis')
+    }
+
+    pending = []
+    unchanged = []
+    for comment in comments:
+        if analyzed.get(comment['commentId']) == comment['textHash']:
+            unchanged.append(comment)
+        else:
+            pending.append(comment)
+    return pending, unchanged
+
+def iter_failed_analysis_pages(video_id, page_size=SAVE_CHUNK_SIZE):
+    """Stored comments whose analysis failed ('unknown'), in pages.
+
+    Incremental syncs only fetch comments newer than the watermark, so these
+    are read back from the database to be analyzed again.
+    """
+    page = []
+    for comment in db.comments.find(
+        {'videoId': video_id, 'emotion': 'unknown'},
+        {'_id': 0, 'commentId': 1, 'text': 1, 'publishedAt': 1, 'parentId': 1}
+    ):
+        page.append(comment)
+        if len(page) == page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+def is_video_stale(video):
+    """Check whether a stored video's comments are older than the staleness window."""
+    last_analyzed = video.get('lastAnalyzed')
+    if not last_analyzed:
+        return True
+    return datetime.utcnow() - last_analyzed > timedelta(seconds=COMMENTS_STALE_SECONDS)
+
+def mark_video_synced(video_id, watermark=None):
+    """Record the sync time and advance the newest-comment watermark."""
+    try:
+        update = {'$set': {'lastAnalyzed': datetime.utcnow()}, '$inc': {'cacheVersion': 1}}
+        if watermark:
+            update['$max'] = {'commentsSyncedAt': watermark}
+        db.videos.update_one({'videoId': video_id}, update)
+    except Exception as e:
+        print(f"Error updating video sync state: {str(e)}")
+        traceback.print_exc()
+        raise
+
+def sync_video_comments(video_id, since=None, job=None):
+    """Stream comments newer than `since` through analysis and storage.
+
+    Pages are fetched, classified and bulk-written concurrently. Only comments
+    that are new, edited or whose analysis failed get classified; the others
+    are saved with their current metadata.
+    """
+    print("Fetching fresh comments from YouTube...")
+    newest = []
+
+    def on_fetched(page):
+        # Replies don't move the watermark; it tracks top-level comments only
+        top_level = [c['publishedAt'] for c in page if not c.get('parentId')]
+        if top_level:
+            newest.append(max(top_level))
+        if job:
+            job.increment(fetched=len(page))
+
+    def on_analyzed(batch):
+        if job:
+            job.increment(analyzed=len(batch))
+
+    def on_saved(summary):
+        if job:
+            job.increment(saved=summary['inserted'] + summary['matched'], failed=summary['failed'])
+
+    totals = run_pipeline(
+        itertools.chain(
+            iter_failed_analysis_pages(video_id),
+            iter_video_comment_pages(video_id, max_comments=MAX_COMMENTS, since=since)
+        ),
+        analyze=analyze_emotions,
+        save=lambda batch: save_comments(video_id, batch),
+        prepare=lambda batch: split_unanalyzed_comments(video_id, batch),
+        on_fetched=on_fetched,
+        on_analyzed=on_analyzed,
+        on_saved=on_saved
+    )
+    print(f"Fetched {totals['fetched']}, analyzed {totals['analyzed']}, saved {totals['saved']} comments")
+    save_model_labels()
+
+    # Comments whose writes failed are older than the new watermark, so an
+    # incremental sync would never fetch them again: keep the old one instead
+    watermark = max(newest) if newest else None
+    if totals['failed']:
+        print(f"Warning: {totals['failed']} comments failed to save; not advancing the sync watermark")
+        watermark = None
+    mark_video_synced(video_id, watermark)
+
+def ingest_video(job):
+    """Run the fetch -> analyze -> save pipeline for a queued analysis job.
+
+    If another process is already ingesting the video, the job waits for it
+    and completes with its result instead.
+    """
+    single_flight.run(job.video_id, lambda: sync_video(job), key=job.id)
+
+def sync_video(job):
+    video_id = job.video_id
+    # Video info saved by an earlier ingestion whose comment sync failed is reused
+    video = db.videos.find_one({'videoId': video_id})
+    if not video:
+        print("Video not found in database, fetching from YouTube...")
+        video = fetch_video_info(video_id)
+        print(f"Fetched video info: {video['title']}")
+        save_video(video)
+
+    full_refresh = job.options.get('refresh') == 'full'
+    since = None if full_refresh else video.get('commentsSyncedAt')
+    sync_video_comments(video_id, since=since, job=job)
+
+# Background analysis jobs, with their records shared by all server processes
+job_queue = create_job_queue(ingest_video, db.jobs)
+
+# With PRELOAD_MODELS=true, load models at import so a preloading server
+# (e.g. gunicorn --preload) shares the weights with its forked workers.
+# Inference pool processes re-import this module and must not preload.
+# The pool itself is never started before the fork: its threads and worker
+# processes would not survive into the forked web workers.
+if os.getenv('PRELOAD_MODELS', 'false').lower() == 'true' and multiprocessing.parent_process() is None:
+    registry.warmup([name for name in ACTIVE_MODELS if name != 'inference_pool'])
+
+STARTUP_SECONDS = time.perf_counter() - APP_IMPORT_STARTED
+print(f"App started in {STARTUP_SECONDS:.2f}s")
+
+def enqueue_analysis(video_id, refresh=None):
+    """Queue an analysis for the video unless one is already queued or running."""
+    job, created = job_queue.find_or_submit(video_id, refresh=refresh)
+    if created:
+        print(f"Queued analysis job {job.id} for video {video_id}")
+    else:
+        single_flight.count('joined')
+    return job
+
+def save_model_labels():
+    """Store the label order of each model once, so packed per-comment scores can be decoded."""
+    for model_version, labels in list(MODEL_LABELS.items()):
+        db.emotion_models.update_one(
+            {'modelVersion': model_version},
+            {'$set': {'modelVersion': model_version, 'labels': labels}},
+            upsert=True
+        )
+
+def get_model_labels(model_versions):
+    """Label order for each of the given model versions."""
+    docs = db.emotion_models.find({'modelVersion': {'$in': list(model_versions)}}, {'_id': 0})
+    return {doc['modelVersion']: doc['labels'] for doc in docs}
 
 def get_video(video_id):
     try:
-        return db.videos.find_one({'videoId': video_id})
+        # A video counts as stored once its comments have been synced
+        return db.videos.find_one({'videoId': video_id, 'lastAnalyzed': {'$exists': True}})
     except Exception as e:
         print(f"Error getting video: {str(e)}")
         return None
 
-def get_video_comments(video_id, page=1, limit=10, sort_by='publishedAt', emotion=None):
-    """Retrieve comments with pagination and filtering."""
+def count_video_comments(video_id, emotion=None, rollup=None):
+    """Comment count from the video's emotion rollup instead of a count_documents scan."""
+    rollup = rollup if rollup is not None else get_video_stats(db, video_id)
+    if not rollup:
+        return 0
+    if emotion:
+        return int(rollup.get('emotions', {}).get(emotion, {}).get('count', 0))
+    return int(rollup.get('total', 0))
+
+def get_video_comments(video_id, page=1, limit=10, sort_by='publishedAt', emotion=None, cursor=None, rollup=None):
+    """Retrieve comments with pagination and filtering.
+
+    With a `cursor` (from a previous page's nextCursor) the page starts right
+    after the last comment already seen, so every page is one index range
+    scan no matter how deep it is; `page` is then ignored. Page numbers still
+    work but pay for the skipped comments.
+    """
     try:
         query = {'videoId': video_id}
         
         if emotion:
             query['emotion'] = emotion
 
-        sort_order = -1 if sort_by in ['publishedAt', 'likeCount', 'emotionConfidence'] else 1
+        keyset = sort_by in CURSOR_SORT_FIELDS
+        if keyset:
+            sort = keyset_sort(sort_by)
+        else:
+            sort = [(sort_by, 1)]
         
         # If limit is 0 or negative, return all comments
         if limit <= 0:
             comments = list(db.comments.find(
                 query,
                 {'_id': 0}  # Exclude _id field
-            ).sort(sort_by, sort_order))
+            ).sort(sort))
             total = len(comments)
             return {
                 'comments': comments,
                 'total': total,
                 'page': 1,
-                'totalPages': 1
+                'totalPages': 1,
+                'nextCursor': None
             }
-        
-        # Otherwise, use pagination
-        skip = (page - 1) * limit
+
+        if cursor:
+            if not keyset:
+                raise InvalidCursorError(f"Cursor pagination is not supported for sortBy={sort_by}")
+            value, comment_id = decode_cursor(cursor, sort_by, emotion)
+            query = {**query, **keyset_filter(sort_by, value, comment_id)}
+            skip = 0
+            page = None
+        else:
+            skip = (page - 1) * limit
+
+        # One extra comment tells whether there is a next page
         comments = list(db.comments.find(
             query,
             {'_id': 0}  # Exclude _id field
-        ).sort(sort_by, sort_order).skip(skip).limit(limit))
+        ).sort(sort).skip(skip).limit(limit + 1))
+        has_more = len(comments) > limit
+        comments = comments[:limit]
 
-        total = db.comments.count_documents(query)
+        total = count_video_comments(video_id, emotion, rollup)
         
         return {
             'comments': comments,
             'total': total,
             'page': page,
-            'totalPages': (total + limit - 1) // limit
+            'totalPages': (total + limit - 1) // limit,
+            'nextCursor': encode_cursor(sort_by, emotion, comments[-1]) if keyset and has_more else None
         }
+    except InvalidCursorError:
+        raise
     except Exception as e:
         print(f"Error getting comments: {str(e)}")
         traceback.print_exc()
         raise
 
-def get_emotion_stats(video_id):
-    """Get emotion statistics for a video."""
+def get_emotion_stats(video_id, rollup=None):
+    """Get emotion statistics for a video from its precomputed rollup."""
     try:
-        pipeline = [
-            {'$match': {'videoId': video_id}},
-            {
-                '$group': {
-                    '_id': '$emotion',
-                    'count': {'$sum': 1},
-                    'avgConfidence': {'$avg': '$emotionConfidence'}
-                }
-            }
-        ]
-        
-        stats = db.comments.aggregate(pipeline)
-        return {stat['_id']: {'count': stat['count'], 'avgConfidence': stat['avgConfidence']} 
-                for stat in stats}
+        return emotion_stats(rollup if rollup is not None else get_video_stats(db, video_id))
     except Exception as e:
         print(f"Error getting emotion stats: {str(e)}")
         traceback.print_exc()
         raise
 
+def cached_json_response(body, etag, status=200):
+    """JSON response carrying an ETag; clients must revalidate before reusing it."""
+    response = app.response_class(response=body, status=status, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/comments', methods=['GET'])
 def get_comments():
     try:
@@ -155,6 +473,7 @@ def get_comments():
         limit = int(request.args.get('limit', 10))
         sort_by = request.args.get('sortBy', 'publishedAt')
         emotion = request.args.get('emotion')
+        cursor = request.args.get('cursor')
 
         if not video_id:
             return jsonify({'error': 'Video ID is required'}), 400
@@ -166,38 +485,58 @@ def get_comments():
         print(f"Retrieved video from DB: {video is not None}")
 
         if not video:
-            print("Video not found in database, fetching from YouTube...")
-            # Fetch new data from YouTube
-            video = fetch_video_info(video_id)
-            print(f"Fetched video info: {video['title']}")
-            save_video(video)
-
-        # Always fetch and analyze new comments
-        print("Fetching fresh comments from YouTube...")
-        youtube_comments = fetch_video_comments(video_id)
-        print(f"Fetched {len(youtube_comments)} comments from YouTube")
-        if youtube_comments:
-            print("Sample comment:", youtube_comments[0])
-            
-            analyzed_comments = analyze_emotions(youtube_comments)
-            print(f"Analyzed {len(analyzed_comments)} comments")
-            if analyzed_comments:
-                print("Sample analyzed comment:", analyzed_comments[0])
-            
-            save_comments(video_id, analyzed_comments)
+            # Nothing stored yet: analyze in the background and let the client poll the job
+            job = enqueue_analysis(video_id)
+            return jsonify({'jobId': job.id, 'status': job.status, 'videoId': video_id}), 202
+
+        # Serve what is stored and refresh stale videos in the background
+        refresh_job = job_queue.find_active(video_id)
+        if refresh_job is not None:
+            single_flight.count('joined')
+        elif request.args.get('refresh') == 'full' or is_video_stale(video):
+            refresh_job = enqueue_analysis(video_id, refresh=request.args.get('refresh'))
+
+        # Responses only change when the video is written; while a refresh is
+        # running they carry its progress, so those are never cached
+        cache_key = None
+        if refresh_job is None and response_cache.enabled:
+            cache_key = response_cache.key('comments', video_id, video.get('cacheVersion', 0), {
+                'page': None if cursor else page,
+                'limit': limit,
+                'sortBy': sort_by,
+                'emotion': emotion,
+                'cursor': cursor
+            })
+            etag = response_cache.etag(cache_key)
+            if request.if_none_match.contains(etag):
+                response_cache.count('notModified')
+                return cached_json_response(None, etag, status=304)
+            body = response_cache.get(cache_key)
+            if body is not None:
+                return cached_json_response(body, etag)
+
+        # One rollup read serves both the totals and the emotion statistics. A
+        # missing rollup is not rebuilt while a refresh is running: the rebuild
+        # would overwrite the refresh's updates, and its first save builds one
+        rollup = get_video_stats(db, video_id, rebuild_missing=refresh_job is None) or {}
 
         # Get comments from database with pagination and filtering
-        result = get_video_comments(
-            video_id,
-            page=page,
-            limit=limit,
-            sort_by=sort_by,
-            emotion=emotion
-        )
+        try:
+            result = get_video_comments(
+                video_id,
+                page=page,
+                limit=limit,
+                sort_by=sort_by,
+                emotion=emotion,
+                cursor=cursor,
+                rollup=rollup
+            )
+        except InvalidCursorError as e:
+            return jsonify({'error': str(e)}), 400
         print(f"Retrieved {len(result['comments'])} comments from database")
 
         # Get emotion statistics
-        emotion_stats = get_emotion_stats(video_id)
+        emotion_stats = get_emotion_stats(video_id, rollup)
         print(f"Emotion stats: {emotion_stats}")
 
         response_data = {
@@ -206,14 +545,26 @@ def get_comments():
             'pagination': {
                 'page': result['page'],
                 'totalPages': result['totalPages'],
-                'total': result['total']
+                'total': result['total'],
+                'nextCursor': result['nextCursor']
             },
-            'emotionStats': emotion_stats
+            'emotionStats': emotion_stats,
+            # Label order for comments stored with packed (compact) scores
+            'emotionLabels': get_model_labels({
+                c['emotionAnalysis']['modelVersion']
+                for c in result['comments']
+                if 'scores' in c.get('emotionAnalysis', {})
+            }),
+            'analysisJob': refresh_job.to_dict() if refresh_job else None
         }
 
         print(f"Sending response with {len(result['comments'])} comments")
+        body = json_util.dumps(response_data)
+        if cache_key is not None:
+            response_cache.set(cache_key, body)
+            return cached_json_response(body, response_cache.etag(cache_key))
         return app.response_class(
-            response=json_util.dumps(response_data),
+            response=body,
             status=200,
             mimetype='application/json'
         )
@@ -223,8 +574,65 @@ def get_comments():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/analyze', methods=['POST'])
+def analyze_video():
+    try:
+        data = request.get_json(silent=True) or {}
+        video_ids = data.get('videoIds') or []
+        video_id = data.get('videoId') or request.args.get('videoId')
+
+        if video_ids:
+            # Batch ingestion: one job per video, run concurrently by the worker pool
+            if not isinstance(video_ids, list):
+                return jsonify({'error': 'videoIds must be a list'}), 400
+            jobs = [enqueue_analysis(vid, refresh=data.get('refresh')) for vid in dict.fromkeys(video_ids)]
+            return jsonify({'jobs': [job.to_dict() for job in jobs]}), 202
+
+        if not video_id:
+            return jsonify({'error': 'Video ID is required'}), 400
+
+        job = enqueue_analysis(video_id, refresh=data.get('refresh'))
+        return jsonify(job.to_dict()), 202
+
+    except Exception as e:
+        print(f"Error queueing analysis: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/videos/<video_id>/stats', methods=['GET'])
+def get_video_emotion_stats(video_id):
+    try:
+        stored = get_video(video_id) is not None
+        rollup = get_video_stats(
+            db, video_id,
+            rebuild_missing=stored and job_queue.find_active(video_id) is None
+        )
+        if rollup is None:
+            if not stored:
+                return jsonify({'error': 'Video not found'}), 404
+            # Being ingested: its first save builds the rollup
+            rollup = {}
+        return jsonify({
+            'videoId': video_id,
+            'total': int(rollup.get('total', 0)),
+            'emotionStats': emotion_stats(rollup),
+            'emotionByDay': emotion_timeline(rollup),
+            'updatedAt': rollup.get('updatedAt')
+        })
+    except Exception as e:
+        print(f"Error getting video stats: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/search', methods=['GET'])
-def search_comments():
+def search_video_comments():
     try:
         video_id = request.args.get('videoId')
         query = request.args.get('query')
@@ -232,22 +640,61 @@ def search_comments():
         if not video_id or not query:
             return jsonify({'error': 'Video ID and search query are required'}), 400
 
-        # Search comments using MongoDB text search
-        comments = list(db.comments.find({
-            'videoId': video_id,
-            'text': {'$regex': query, '$options': 'i'}
-        }, {'_id': 0}))  # Exclude _id field
+        # Indexed, relevance-ranked $text search; mode=regex opts into a full scan
+        try:
+            result = search_comments(
+                db.comments,
+                video_id,
+                query,
+                emotion=request.args.get('emotion'),
+                page=int(request.args.get('page', 1)),
+                limit=int(request.args.get('limit', 20)),
+                mode=request.args.get('mode', 'text')
+            )
+        except InvalidSearchError as e:
+            return jsonify({'error': str(e)}), 400
 
-        return jsonify({'comments': serialize_mongo_doc(comments)})
+        # json_util, like /comments: packed scores (COMPACT_SCORES) are bytes, which jsonify rejects
+        return app.response_class(
+            response=json_util.dumps(result),
+            status=200,
+            mimetype='application/json'
+        )
 
     except Exception as e:
         print(f"Error in search: {str(e)}")
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'predictionCache': prediction_cache.stats(),
+        'responseCache': response_cache.stats(),
+        'singleFlight': single_flight.stats(),
+        'youtubeQuota': quota_limiter.stats(),
+        'inferencePool': get_inference_pool().stats() if registry.is_ready(['inference_pool']) else None
+    })
+
+@app.route('/health/live', methods=['GET'])
+def health_live():
+    return jsonify({'status': 'ok'})
+
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    ready = registry.is_ready(ACTIVE_MODELS)
+    return jsonify({
+        'ready': ready,
+        'models': {name: status for name, status in registry.status().items() if name in ACTIVE_MODELS},
+        'startupSeconds': STARTUP_SECONDS
+    }), 200 if ready else 503
+
 if __name__ == '__main__':
-    # Setup database indexes
+    # Setup database indexes; under gunicorn, gunicorn.conf.py does this at startup
     setup_indexes(db)
+
+    # Warm the models without delaying the server; /health/ready reports progress
+    registry.warmup_in_background(ACTIVE_MODELS)
     
     port = int(os.getenv('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""Benchmark: indexed $text search against the previous unanchored regex scan.
+
+Seeds a scratch database (dropped afterwards unless --keep) on MONGODB_URI:
+
+    cd backend
+    python benchmarks/bench_search.py --comments 500000 --videos 20 --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from config.mongodb import setup_indexes
+from services.search import search_comments
+
+EMOTIONS = ['joy', 'sadness', 'anger', 'fear', 'surprise', 'disgust', 'neutral']
+WORDS = (
+    "video song love great music amazing best channel content funny terrible boring scary "
+    "tutorial explanation thanks please update first watch again years ago still here "
+    "beautiful voice guitar cover remix lyrics ending intro chorus drop beat"
+).split()
+QUERIES = ['guitar', 'beautiful voice', 'remix', 'tutorial explanation']
+
+def seed(collection, comments, videos, seed_value=42, batch_size=10000):
+    rng = random.Random(seed_value)
+    batch = []
+    for i in range(comments):
+        batch.append({
+            'commentId': f"c{i}",
+            'videoId': f"video{i % videos}",
+            'text': ' '.join(rng.choices(WORDS, k=rng.randint(5, 30))),
+            'emotion': rng.choice(EMOTIONS),
+            'emotionConfidence': rng.random(),
+            'likeCount': rng.randint(0, 1000),
+            'publishedAt': f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z"
+        })
+        if len(batch) == batch_size:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+def legacy_search(collection, video_id, query):
+    """The previous /search query: every match, unpaginated."""
+    return list(collection.find({
+        'videoId': video_id,
+        'text': {'$regex': query, '$options': 'i'}
+    }, {'_id': 0}))
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def docs_examined(collection, filters):
+    stats = collection.database.command('explain', {'find': collection.name, 'filter': filters}, verbosity='executionStats')
+    return stats['executionStats']['totalDocsExamined']
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark $text search against the regex scan')
+    parser.add_argument('--comments', type=int, default=500000)
+    parser.add_argument('--videos', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database', default='youtube_emotions_bench')
+    parser.add_argument('--keep', action='store_true', help='Keep the seeded database')
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017'))
+    db = client[args.database]
+    try:
+        if db.comments.estimated_document_count() != args.comments:
+            db.comments.drop()
+            started = time.perf_counter()
+            seed(db.comments, args.comments, args.videos)
+            print(f"Seeded {args.comments} comments over {args.videos} videos in {time.perf_counter() - started:.1f}s")
+        setup_indexes(db)
+
+        video_id = 'video0'
+        print(f"{args.comments // args.videos} comments in {video_id}, best of {args.repeat}")
+        for query in QUERIES:
+            legacy = best_time(lambda: legacy_search(db.comments, video_id, query), args.repeat)
+            text = best_time(lambda: search_comments(db.comments, video_id, query), args.repeat)
+            text_emotion = best_time(lambda: search_comments(db.comments, video_id, query, emotion='joy'), args.repeat)
+            regex_page = best_time(lambda: search_comments(db.comments, video_id, query, mode='regex'), args.repeat)
+
+            scanned = docs_examined(db.comments, {'videoId': video_id, 'text': {'$regex': query, '$options': 'i'}})
+            indexed = docs_examined(db.comments, {'videoId': video_id, '$text': {'$search': query}})
+            print(f"  {query!r}")
+            print(f"    legacy regex, all matches  {legacy * 1000:9.1f} ms  {scanned} docs examined")
+            print(f"    regex mode, one page       {regex_page * 1000:9.1f} ms")
+            print(f"    $text, one page            {text * 1000:9.1f} ms  {indexed} docs examined  "
+                  f"{legacy / text:6.1f}x")
+            print(f"    $text + emotion, one page  {text_emotion * 1000:9.1f} ms")
+    finally:
+        if not args.keep:
+            client.drop_database(args.database)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""Micro-benchmark: TextCleaner against the previous four-regex clean_text.
+
+    cd backend
+    python benchmarks/bench_text_cleaner.py --texts 50000 --repeat 5
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlp.cleaner import TextCleaner
+
+SAMPLE_COMMENTS = [
+    "This video is amazing! I love it so much!!! 😂😂😂",
+    "Check out my channel https://www.youtube.com/channel/UC123456 for more content",
+    "@JohnDoe you're totally right, this is the best explanation I've seen",
+    "I can't believe they cancelled the show, this is so sad 😭💔",
+    "Contact me at someone.else@example.com if you want the PDF",
+    "¡Qué video tan bonito! Me encantó la música 🎶",
+    "Wer ist 2024 noch hier? 🙋‍♂️",
+    "ये गाना बहुत अच्छा है ❤️❤️",
+    "日本からのコメントです、素晴らしい動画でした👍🏽",
+    "First!!!",
+    "The tutorial starts at 2:30, skip the intro lol",
+    "Ugh, that's disgusting 🤢 why would anyone eat that???",
+    "Honestly that jump scare terrified me 😱 10/10 would watch again",
+    "Nobody asked for this update, it ruined everything. www.example.org/petition"
+]
+
+def legacy_clean_text(text):
+    """The previous TextPreprocessor.clean_text, kept here as the baseline."""
+    text = text.lower()
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\S+@\S+', '', text)
+    text = re.sub(r'[^a-zA-Z\s]', '', text)
+    text = ' '.join(text.split())
+    return text
+
+def make_corpus(size, samples=SAMPLE_COMMENTS, seed=42):
+    rng = random.Random(seed)
+    return [
+        ' '.join(rng.sample(samples, rng.randint(1, 3)))
+        for _ in range(size)
+    ]
+
+def best_time(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark TextCleaner against the legacy clean_text')
+    parser.add_argument('--texts', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    cleaner = TextCleaner()
+    ascii_cleaner = TextCleaner(unicode_letters=False, emoji='remove', mentions='keep')
+    corpora = [
+        ('mixed (emoji, non-English)', make_corpus(args.texts)),
+        ('ASCII only', make_corpus(args.texts, [text for text in SAMPLE_COMMENTS if text.isascii()]))
+    ]
+
+    for label, corpus in corpora:
+        cases = [
+            ('legacy clean_text', lambda: [legacy_clean_text(text) for text in corpus]),
+            ('TextCleaner.clean_batch', lambda: cleaner.clean_batch(corpus)),
+            ('TextCleaner.clean_batch (ASCII rules)', lambda: ascii_cleaner.clean_batch(corpus))
+        ]
+
+        print(f"{label}: {len(corpus)} texts, best of {args.repeat}")
+        baseline = None
+        for name, func in cases:
+            seconds = best_time(func, args.repeat)
+            baseline = baseline or seconds
+            print(f"  {name:40s} {seconds * 1000:9.1f} ms  {seconds / len(corpus) * 1e6:7.2f} us/text  "
+                  f"{baseline / seconds:5.2f}x")
+
+        # The ASCII rules drop the same characters as the legacy cleaner; report where they differ
+        legacy = [legacy_clean_text(text) for text in corpus]
+        differing = sum(1 for old, new in zip(legacy, ascii_cleaner.clean_batch(corpus)) if old != new)
+        print(f"  ASCII rules differ from legacy output on {differing}/{len(corpus)} texts")
+
+    for text in SAMPLE_COMMENTS[:8]:
+        print(f"{text!r}\n  -> {cleaner.clean(text)!r}")
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 from pymongo import MongoClient
+from pymongo.errors import OperationFailure
 import os
 from dotenv import load_dotenv
 
@@ -12,18 +13,58 @@ def get_database():
     client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017'))
     return client.youtube_emotions
 
+def _drop_index_if_exists(collection, name):
+    # Several server processes may run setup_indexes at once; losing the race to drop is fine
+    if name in collection.index_information():
+        try:
+            collection.drop_index(name)
+        except OperationFailure:
+            if name in collection.index_information():
+                raise
+
 def setup_indexes(db):
     """
     Setup all required indexes for optimal performance
     """
-    # Text index for search functionality
-    db.comments.create_index([('text', 'text')])
+    # Comment upserts match on commentId: without this index every write in a
+    # bulk save scans the collection, and concurrent upserts can insert duplicates
+    db.comments.create_index([('commentId', 1)], unique=True)
+
+    # Text index for search. $text queries must match the videoId prefix by
+    # equality, and the emotion suffix filters inside the index. A collection
+    # has at most one text index, so the old text-only one is replaced
+    _drop_index_if_exists(db.comments, 'text_text')
+    db.comments.create_index([('videoId', 1), ('text', 'text'), ('emotion', 1)])
     
-    # Compound indexes for filtering and sorting
-    db.comments.create_index([('videoId', 1), ('emotion', 1)])
-    db.comments.create_index([('videoId', 1), ('publishedAt', -1)])
-    db.comments.create_index([('videoId', 1), ('likeCount', -1)])
-    db.comments.create_index([('videoId', 1), ('emotionConfidence', -1)])
+    # Compound indexes for filtering and keyset pagination; commentId breaks
+    # ties so a page can resume after (sort value, commentId)
+    for field in ('publishedAt', 'likeCount', 'emotionConfidence'):
+        db.comments.create_index([('videoId', 1), (field, -1), ('commentId', -1)])
+        db.comments.create_index([('videoId', 1), ('emotion', 1), (field, -1), ('commentId', -1)])
+
+    # Superseded by the indexes above, which have them as prefixes
+    for name in ('videoId_1_emotion_1', 'videoId_1_publishedAt_-1',
+                 'videoId_1_likeCount_-1', 'videoId_1_emotionConfidence_-1'):
+        _drop_index_if_exists(db.comments, name)
     
     # Video collection indexes
-    db.videos.create_index([('videoId', 1)], unique=True) 
\ No newline at end of file
+    db.videos.create_index([('videoId', 1)], unique=True)
+    
+    # One emotion rollup per video
+    db.video_stats.create_index([('videoId', 1)], unique=True)
+
+    # Analysis job records: a video's active job is looked up by any server
+    # process, and finished jobs expire after JOB_RETENTION_SECONDS
+    db.jobs.create_index([('videoId', 1), ('status', 1), ('createdAt', -1)])
+    db.jobs.create_index(
+        [('finishedAt', 1)],
+        expireAfterSeconds=int(os.getenv('JOB_RETENTION_SECONDS', 86400))
+    )
+
+def main():
+    """Create or update the indexes: python -m config.mongodb"""
+    setup_indexes(get_database())
+    print("Database indexes are up to date")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
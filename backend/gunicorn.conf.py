@@ -0,0 +1,15 @@
+import traceback
+from config.mongodb import get_database, setup_indexes
+
+def on_starting(server):
+    """Create the database indexes once, in the master, before any worker serves requests.
+
+    A failure is logged and the server starts anyway; run
+    `python -m config.mongodb` to create the indexes later.
+    """
+    try:
+        setup_indexes(get_database())
+        print("Database indexes are up to date")
+    except Exception as e:
+        print(f"Error setting up indexes: {str(e)}")
+        traceback.print_exc()
\ No newline at end of file
@@ -1,5 +1,6 @@
+from .cleaner import TextCleaner
 from .preprocessor import TextPreprocessor
 from .feature_extractor import FeatureExtractor
 from .emotion_classifier import EmotionClassifier
 
-__all__ = ['TextPreprocessor', 'FeatureExtractor', 'EmotionClassifier'] 
\ No newline at end of file
+__all__ = ['TextCleaner', 'TextPreprocessor', 'FeatureExtractor', 'EmotionClassifier'] 
\ No newline at end of file
@@ -0,0 +1,200 @@
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator
+import numpy as np
+import sklearn
+import json
+import os
+import shutil
+import tempfile
+
+# Bump when the on-disk layout changes in a way older loaders cannot read
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
+class ArtifactWriter:
+    """Write a model artifact directory: NumPy arrays plus a JSON manifest.
+
+    Files are written to a staging directory next to the target, which is
+    swapped in only after the manifest is written, so readers never see a
+    partial artifact. Processes that still memory-map the previous version
+    keep their (unlinked) files until they reload.
+
+    Example:
+        with ArtifactWriter('models/emotion', 'emotion_classifier') as writer:
+            writer.add_array('coef_', coef)
+            writer.metadata['model_type'] = 'logistic'
+    """
+
+    def __init__(self, directory: str, kind: str):
+        self.directory = os.path.abspath(directory)
+        self.kind = kind
+        self.metadata: Dict[str, Any] = {}
+        self.arrays: Dict[str, Dict[str, Any]] = {}
+        parent = os.path.dirname(self.directory)
+        os.makedirs(parent, exist_ok=True)
+        self.staging = tempfile.mkdtemp(prefix=f".{os.path.basename(self.directory)}-", dir=parent)
+
+    def add_array(self, name: str, array: np.ndarray):
+        """Store an array as <name>.npy so it can be loaded with mmap_mode='r'."""
+        array = np.ascontiguousarray(array)
+        if array.dtype == object:
+            raise ValueError(f"Array {name} has dtype object and cannot be memory-mapped")
+        np.save(os.path.join(self.staging, f"{name}.npy"), array, allow_pickle=False)
+        self.arrays[name] = {'dtype': array.dtype.str, 'shape': list(array.shape)}
+
+    def path(self, filename: str) -> str:
+        """Path for an extra file (e.g. a joblib fallback) inside the artifact."""
+        return os.path.join(self.staging, filename)
+
+    def commit(self):
+        manifest = {
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'kind': self.kind,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'sklearn_version': sklearn.__version__,
+            'numpy_version': np.__version__,
+            'arrays': self.arrays,
+            'files': sorted(os.listdir(self.staging)),
+            'metadata': self.metadata
+        }
+        with open(os.path.join(self.staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        previous = None
+        if os.path.exists(self.directory):
+            previous = f"{self.staging}.old"
+            os.rename(self.directory, previous)
+        os.rename(self.staging, self.directory)
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+
+    def abort(self):
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def __enter__(self) -> 'ArtifactWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+class Artifact:
+    """Read-only view of an artifact directory written by ArtifactWriter."""
+
+    def __init__(self, directory: str, kind: str, mmap: bool = True):
+        self.directory = directory
+        self.mmap = mmap
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No artifact manifest at {manifest_path}")
+        with open(manifest_path, 'r') as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported artifact format version {self.manifest.get('format_version')} "
+                f"(expected {ARTIFACT_FORMAT_VERSION})"
+            )
+        if self.manifest.get('kind') != kind:
+            raise ValueError(f"Artifact at {directory} holds '{self.manifest.get('kind')}', expected '{kind}'")
+        if self.manifest.get('sklearn_version') != sklearn.__version__:
+            print(f"Warning: Artifact at {directory} was written with scikit-learn "
+                  f"{self.manifest.get('sklearn_version')}, running {sklearn.__version__}")
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.manifest['metadata']
+
+    def has_array(self, name: str) -> bool:
+        return name in self.manifest['arrays']
+
+    def array(self, name: str) -> np.ndarray:
+        """Load an array, memory-mapped read-only unless the artifact was opened with mmap=False."""
+        return np.load(
+            os.path.join(self.directory, f"{name}.npy"),
+            mmap_mode='r' if self.mmap else None,
+            allow_pickle=False
+        )
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+class CompactVocabulary(Mapping):
+    """Read-only term -> column mapping backed by two flat arrays.
+
+    Terms are stored sorted as fixed-width UTF-8 bytes, so the vocabulary can be
+    memory-mapped and shared between processes instead of every worker
+    unpickling its own dict. `lookup` resolves a whole batch of terms with one
+    np.searchsorted; the Mapping interface keeps scikit-learn helpers working.
+    """
+
+    def __init__(self, terms: np.ndarray, columns: np.ndarray):
+        self.terms = terms
+        self.columns = columns
+
+    @classmethod
+    def from_mapping(cls, vocabulary: Dict[str, int]) -> 'CompactVocabulary':
+        items = sorted((term.encode('utf-8'), column) for term, column in vocabulary.items())
+        terms = np.array([term for term, _ in items], dtype=bytes)
+        columns = np.array([column for _, column in items], dtype=np.int32)
+        if len(items) == 0:
+            terms = np.array([], dtype='S1')
+        return cls(terms, columns)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {'vocabulary_terms': self.terms, 'vocabulary_columns': self.columns}
+
+    def lookup(self, terms: Iterable[str]) -> np.ndarray:
+        """Map terms to their columns, with -1 for terms outside the vocabulary."""
+        encoded = [term.encode('utf-8') for term in terms]
+        result = np.full(len(encoded), -1, dtype=np.int64)
+        if not encoded or len(self.terms) == 0:
+            return result
+
+        # Terms longer than the stored width cannot be in the vocabulary (and would be truncated)
+        width = self.terms.dtype.itemsize
+        fits = np.fromiter((len(term) <= width for term in encoded), dtype=bool, count=len(encoded))
+        if not fits.any():
+            return result
+        queries = np.array([term for term, ok in zip(encoded, fits) if ok], dtype=self.terms.dtype)
+
+        positions = np.searchsorted(self.terms, queries)
+        clipped = np.minimum(positions, len(self.terms) - 1)
+        found = self.terms[clipped] == queries
+        matched = np.full(len(queries), -1, dtype=np.int64)
+        matched[found] = self.columns[clipped[found]]
+        result[fits] = matched
+        return result
+
+    def feature_names(self) -> np.ndarray:
+        """Terms in column order, like get_feature_names_out."""
+        names = np.empty(len(self.terms), dtype=object)
+        names[np.asarray(self.columns)] = [term.decode('utf-8') for term in self.terms]
+        return names
+
+    def __getitem__(self, term: str) -> int:
+        column = int(self.lookup([term])[0])
+        if column < 0:
+            raise KeyError(term)
+        return column
+
+    def __contains__(self, term: object) -> bool:
+        return isinstance(term, str) and self.lookup([term])[0] >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return (term.decode('utf-8') for term in self.terms)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+def to_json_value(value: Any) -> Any:
+    """Convert a parameter or scalar attribute to JSON, raising TypeError if it has no JSON form."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, tuple):
+        return [to_json_value(v) for v in value]
+    json.dumps(value)
+    return value
@@ -0,0 +1,208 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+# Pictographic blocks treated as emoji; skin tones, variation selectors and
+# keycaps are folded into the preceding emoji
+EMOJI_RANGES = (
+    '\U0001F000-\U0001FAFF'  # Mahjong/cards, enclosed, symbols & pictographs, emoticons, transport, supplemental
+    '\u2300-\u23FF'          # Miscellaneous technical (watch, alarm clock, ...)
+    '\u2600-\u27BF'          # Miscellaneous symbols and dingbats (including the heart)
+    '\u2B00-\u2BFF'          # Arrows and stars
+)
+EMOJI_MODIFIERS = '\uFE0F\u20E3\U0001F3FB-\U0001F3FF'
+
+URL_PATTERN = r'(?:https?://|www\.)\S+'
+EMAIL_PATTERN = r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+'
+# Punctuation allowed around an email or mention token, e.g. "(me@example.com)," or "@bob:"
+TOKEN_PUNCTUATION = '()[]<>{}"\'.,;:!?'
+
+# Short tokens for frequent comment emoji; the rest are named from unicodedata
+DEFAULT_EMOJI_TOKENS = {
+    '😂': 'emoji_joy',
+    '🤣': 'emoji_joy',
+    '😊': 'emoji_smile',
+    '🙂': 'emoji_smile',
+    '😀': 'emoji_smile',
+    '😁': 'emoji_smile',
+    '😍': 'emoji_love',
+    '🥰': 'emoji_love',
+    '❤': 'emoji_love',
+    '😘': 'emoji_love',
+    '😢': 'emoji_sad',
+    '😭': 'emoji_sad',
+    '😔': 'emoji_sad',
+    '💔': 'emoji_sad',
+    '😡': 'emoji_angry',
+    '😠': 'emoji_angry',
+    '🤬': 'emoji_angry',
+    '😱': 'emoji_fear',
+    '😨': 'emoji_fear',
+    '😰': 'emoji_fear',
+    '😮': 'emoji_surprise',
+    '😲': 'emoji_surprise',
+    '🤯': 'emoji_surprise',
+    '🤢': 'emoji_disgust',
+    '🤮': 'emoji_disgust',
+    '👍': 'emoji_thumbsup',
+    '👎': 'emoji_thumbsdown',
+    '🔥': 'emoji_fire',
+    '💀': 'emoji_skull'
+}
+
+def _is_kept(char: str) -> bool:
+    """Letters, combining marks and whitespace survive cleaning.
+
+    re's \\w does not include marks (Mn/Mc/Me), so the vowel signs of e.g.
+    Devanagari or Thai are kept explicitly. Emoji modifiers are marks too,
+    but are only meaningful attached to an emoji.
+    """
+    if char.isalpha() or char.isspace():
+        return True
+    return unicodedata.category(char).startswith('M') and char not in '\uFE0F\u20E3'
+
+# Code points that can hold letters or marks: planes 0-3 and the variation
+# selectors in plane 14 (planes 4-13 are unassigned, 15-16 private use)
+SCANNED_CODE_POINTS = ((0x0, 0x3FFFF), (0xE0000, 0xE0FFF))
+
+@lru_cache(maxsize=None)
+def _drop_class(keep_emoji: bool) -> str:
+    """Character class body of everything but letters, marks and whitespace.
+
+    The class is negated, so every astral symbol (e.g. musical symbols or
+    private use characters) is dropped too. Emoji are spared when they are
+    handled by the emoji rule afterwards.
+    """
+    emoji_char = re.compile(f"[{EMOJI_RANGES}{EMOJI_MODIFIERS}]")
+    ranges = []
+    for first, last in SCANNED_CODE_POINTS:
+        start = None
+        for code in range(first, last + 1):
+            char = chr(code)
+            if _is_kept(char) or (keep_emoji and emoji_char.match(char)):
+                if start is None:
+                    start = code
+            elif start is not None:
+                ranges.append((start, code - 1))
+                start = None
+        if start is not None:
+            ranges.append((start, last))
+    body = ''.join(
+        re.escape(chr(a)) if a == b else f"{re.escape(chr(a))}-{re.escape(chr(b))}"
+        for a, b in ranges
+    )
+    return '^' + body
+
+class TextCleaner:
+    """Precompiled comment cleaner.
+
+    Every text gets one mandatory regex pass that drops everything but letters
+    and whitespace. The URL, email/mention and emoji rules are compiled once
+    and only run on texts that can contain them: cheap substring and
+    str.isascii checks (C-level scans) skip them for most comments. This
+    measured faster than one big alternation, which CPython's re engine
+    retries at every character (see benchmarks/bench_text_cleaner.py).
+
+    Args:
+        urls (str): 'remove' or 'token' (replace with "url")
+        emails (str): 'remove' or 'token' (replace with "email")
+        mentions (str): 'remove', 'token' (replace with "mention") or 'keep'
+            (keep the name, dropping the @ like other punctuation)
+        emoji (str): 'token' (map to emoji_* tokens), 'remove' or 'keep'
+        unicode_letters (bool): Keep letters of every script; False keeps only a-z
+        lowercase (bool): Lowercase the text first
+        emoji_tokens (Dict[str, str]): Extra or overriding emoji -> token mappings
+    """
+
+    RULE_MODES = {
+        'urls': ('remove', 'token'),
+        'emails': ('remove', 'token'),
+        'mentions': ('remove', 'token', 'keep'),
+        'emoji': ('token', 'remove', 'keep')
+    }
+
+    def __init__(self, urls: str = 'remove', emails: str = 'remove', mentions: str = 'remove',
+                 emoji: str = 'token', unicode_letters: bool = True, lowercase: bool = True,
+                 emoji_tokens: Optional[Dict[str, str]] = None):
+        for rule, mode in (('urls', urls), ('emails', emails), ('mentions', mentions), ('emoji', emoji)):
+            if mode not in self.RULE_MODES[rule]:
+                raise ValueError(f"Unsupported {rule} mode: {mode}")
+
+        self.urls = urls
+        self.emails = emails
+        self.mentions = mentions
+        self.emoji = emoji
+        self.unicode_letters = unicode_letters
+        self.lowercase = lowercase
+        self.emoji_tokens = {**DEFAULT_EMOJI_TOKENS, **(emoji_tokens or {})}
+
+        self.url_replacement = ' url ' if urls == 'token' else ' '
+        self.at_replacements = {
+            'email': ' email ' if emails == 'token' else ' ',
+            'mention': ' mention ' if mentions == 'token' else ' '
+        }
+
+        self.url_pattern = re.compile(URL_PATTERN)
+        self.email_pattern = re.compile(EMAIL_PATTERN)
+        self.emoji_pattern = re.compile(f"[{EMOJI_RANGES}][{EMOJI_MODIFIERS}]*")
+
+        # Emoji survive the drop pass and are replaced (or spaced out) afterwards
+        keep_emoji = emoji != 'remove'
+        protected = EMOJI_RANGES + EMOJI_MODIFIERS if keep_emoji else ''
+        if unicode_letters:
+            self.drop_pattern = re.compile(f"[{_drop_class(keep_emoji)}]+")
+        else:
+            self.drop_pattern = re.compile(f"[^a-zA-Z\\s{protected}]+")
+        self.ascii_drop_pattern = re.compile(r'[^a-zA-Z\s]+')
+
+    def _replace_at(self, token: str) -> str:
+        """Replace a whitespace-separated token containing @ if it is a mention or an email."""
+        if '@' not in token:
+            return token
+        core = token.strip(TOKEN_PUNCTUATION)
+        if core.startswith('@') and len(core) > 1:
+            if self.mentions != 'keep':
+                return self.at_replacements['mention']
+        elif self.email_pattern.fullmatch(core):
+            return self.at_replacements['email']
+        return token
+
+    def _replace_emoji(self, match: 're.Match') -> str:
+        return f" {self.emoji_token(match.group()[0])} "
+
+    def emoji_token(self, char: str) -> str:
+        """Token for an emoji: the configured mapping, else emoji_<unicode name>."""
+        token = self.emoji_tokens.get(char)
+        if token is None:
+            name = unicodedata.name(char, 'symbol').lower()
+            token = 'emoji_' + re.sub(r'[^a-z0-9]+', '_', name).strip('_')
+            self.emoji_tokens[char] = token
+        return token
+
+    def clean(self, text: str) -> str:
+        """Clean one text."""
+        if self.lowercase:
+            text = text.lower()
+        if 'http' in text or 'www.' in text:
+            text = self.url_pattern.sub(self.url_replacement, text)
+        if '@' in text:
+            # Emails and mentions are whole tokens, so only look at the tokens with an @
+            text = ' '.join([self._replace_at(token) for token in text.split()])
+
+        if text.isascii():
+            text = self.ascii_drop_pattern.sub('', text)
+        else:
+            text = self.drop_pattern.sub('', text)
+            if self.emoji == 'token':
+                text = self.emoji_pattern.sub(self._replace_emoji, text)
+            elif self.emoji == 'keep':
+                text = self.emoji_pattern.sub(r' \g<0> ', text)
+        return ' '.join(text.split())
+
+    __call__ = clean
+
+    def clean_batch(self, texts: Iterable[str]) -> List[str]:
+        """Clean a list (or any iterable) of texts."""
+        clean = self.clean
+        return [clean(text) for text in texts]
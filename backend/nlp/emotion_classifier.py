@@ -1,13 +1,16 @@
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.svm import LinearSVC
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.base import clone
 from sklearn.metrics import accuracy_score, f1_score, confusion_matrix, classification_report
 import numpy as np
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Tuple, Optional, Iterable
 import joblib
 import json
 import os
+from .feature_extractor import FeatureMatrix
+from .artifacts import Artifact, ArtifactWriter, to_json_value
 
 class EmotionClassifier:
     EMOTIONS = ['joy', 'sadness', 'anger', 'fear', 'surprise', 'love', 'neutral']
@@ -16,27 +19,32 @@ class EmotionClassifier:
         'naive_bayes': MultinomialNB(),
         'svm': LinearSVC(random_state=42),
         'random_forest': RandomForestClassifier(n_estimators=100, random_state=42),
-        'logistic': LogisticRegression(random_state=42, max_iter=1000)
+        'logistic': LogisticRegression(random_state=42, max_iter=1000),
+        'sgd': SGDClassifier(loss='log_loss', random_state=42)
     }
 
+    # Models that can be trained incrementally with partial_fit
+    INCREMENTAL_MODELS = ['naive_bayes', 'sgd']
+
     def __init__(self, model_type: str = 'logistic'):
         """Initialize the emotion classifier.
         
         Args:
-            model_type (str): Type of model to use ('naive_bayes', 'svm', 'random_forest', 'logistic')
+            model_type (str): Type of model to use ('naive_bayes', 'svm', 'random_forest', 'logistic', 'sgd')
         """
         if model_type not in self.MODELS:
             raise ValueError(f"Unsupported model type: {model_type}")
         
         self.model_type = model_type
-        self.model = self.MODELS[model_type]
+        # Clone so classifiers never share (and partially fit) the same estimator
+        self.model = clone(self.MODELS[model_type])
         self.is_trained = False
 
-    def train(self, X: np.ndarray, y: np.ndarray) -> Dict[str, float]:
+    def train(self, X: FeatureMatrix, y: np.ndarray) -> Dict[str, float]:
         """Train the emotion classifier.
         
         Args:
-            X (np.ndarray): Feature vectors
+            X (FeatureMatrix): Feature vectors, dense or sparse
             y (np.ndarray): Emotion labels
             
         Returns:
@@ -55,11 +63,69 @@ class EmotionClassifier:
         
         return metrics
 
-    def predict(self, X: np.ndarray) -> np.ndarray:
+    def partial_fit(self, X: FeatureMatrix, y: np.ndarray, classes: Optional[List[str]] = None):
+        """Update the classifier with one batch of data.
+        
+        Args:
+            X (FeatureMatrix): Feature vectors, dense or sparse
+            y (np.ndarray): Emotion labels
+            classes (List[str]): All labels that can occur; required on the first call
+        """
+        if self.model_type not in self.INCREMENTAL_MODELS:
+            raise ValueError(f"Model type {self.model_type} does not support incremental training")
+        if not self.is_trained and classes is None:
+            raise ValueError("classes must be given for the first partial_fit call")
+        
+        self.model.partial_fit(X, y, classes=None if self.is_trained else classes)
+        self.is_trained = True
+
+    def train_incremental(self, batches: Iterable[Tuple[FeatureMatrix, np.ndarray]], classes: List[str],
+                          checkpoint_path: Optional[str] = None, checkpoint_every: int = 10) -> Dict[str, float]:
+        """Train on a stream of (X, y) batches without holding the data in memory.
+        
+        Each batch is scored before the model learns from it (progressive
+        validation), so the returned accuracy estimates performance on unseen data.
+        
+        Args:
+            batches (Iterable): (feature vectors, labels) batches
+            classes (List[str]): All labels that can occur
+            checkpoint_path (str): Where to save checkpoints with save(), if given
+            checkpoint_every (int): Number of batches between checkpoints
+            
+        Returns:
+            Dict[str, float]: Training metrics
+        """
+        n_batches = 0
+        n_samples = 0
+        n_correct = 0
+        
+        for X, y in batches:
+            if self.is_trained:
+                n_correct += int(np.sum(self.model.predict(X) == y))
+            else:
+                # Nothing to validate against before the first update
+                n_samples -= len(y)
+            self.partial_fit(X, y, classes)
+            n_batches += 1
+            n_samples += len(y)
+            
+            if checkpoint_path and n_batches % checkpoint_every == 0:
+                self.save(checkpoint_path)
+                print(f"Saved checkpoint after {n_batches} batches")
+        
+        if checkpoint_path and self.is_trained:
+            self.save(checkpoint_path)
+        
+        return {
+            'batches': n_batches,
+            'progressive_accuracy': n_correct / n_samples if n_samples > 0 else 0.0
+        }
+
+    def predict(self, X: FeatureMatrix) -> np.ndarray:
         """Predict emotions for new data.
         
         Args:
-            X (np.ndarray): Feature vectors
+            X (FeatureMatrix): Feature vectors, dense or sparse
             
         Returns:
             np.ndarray: Predicted emotion labels
@@ -68,11 +134,11 @@ class EmotionClassifier:
             raise ValueError("Model must be trained before making predictions")
         return self.model.predict(X)
 
-    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+    def predict_proba(self, X: FeatureMatrix) -> np.ndarray:
         """Get probability estimates for each emotion.
         
         Args:
-            X (np.ndarray): Feature vectors
+            X (FeatureMatrix): Feature vectors, dense or sparse
             
         Returns:
             np.ndarray: Probability estimates for each emotion class
@@ -89,11 +155,11 @@ class EmotionClassifier:
         else:
             raise NotImplementedError("Probability estimation not supported for this model")
 
-    def evaluate(self, X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+    def evaluate(self, X: FeatureMatrix, y: np.ndarray) -> Dict[str, Any]:
         """Evaluate the model's performance.
         
         Args:
-            X (np.ndarray): Feature vectors
+            X (FeatureMatrix): Feature vectors, dense or sparse
             y (np.ndarray): True emotion labels
             
         Returns:
@@ -156,6 +222,83 @@ class EmotionClassifier:
         self.model_type = metadata['model_type']
         self.is_trained = metadata['is_trained']
 
+    def save_artifact(self, directory: str):
+        """Save the trained model as a memory-mappable artifact directory.
+        
+        Fitted array attributes (coefficients, log probabilities, classes) are
+        written as .npy files and everything else goes into the manifest. Models
+        that cannot be represented that way (e.g. random forests) fall back to
+        a joblib file, which from_artifact still memory-maps.
+        
+        Artifacts are meant for serving; use save() checkpoints to resume training.
+        
+        Args:
+            directory (str): Artifact directory (replaced atomically if it exists)
+        """
+        if not self.is_trained:
+            raise ValueError("Model must be trained before saving")
+        
+        arrays, attributes = {}, {}
+        try:
+            params = {name: to_json_value(value) for name, value in self.model.get_params().items()}
+            for name, value in vars(self.model).items():
+                # Public fitted attributes end with an underscore
+                if not name.endswith('_') or name.startswith('_'):
+                    continue
+                if isinstance(value, np.ndarray) and value.dtype != object:
+                    arrays[name] = value
+                else:
+                    attributes[name] = to_json_value(value)
+            layout = 'arrays'
+        except TypeError:
+            layout = 'joblib'
+        
+        with ArtifactWriter(directory, 'emotion_classifier') as writer:
+            writer.metadata.update({
+                'model_type': self.model_type,
+                'emotions': self.EMOTIONS,
+                'layout': layout
+            })
+            if layout == 'arrays':
+                writer.metadata.update({'params': params, 'attributes': attributes})
+                for name, value in arrays.items():
+                    writer.add_array(name, value)
+            else:
+                joblib.dump(self.model, writer.path('model.joblib'))
+
+    @classmethod
+    def from_artifact(cls, directory: str, mmap: bool = True) -> 'EmotionClassifier':
+        """Load a classifier saved with save_artifact.
+        
+        Args:
+            directory (str): Artifact directory
+            mmap (bool): Memory-map the arrays read-only, so processes loading the
+                same artifact share one physical copy
+            
+        Returns:
+            EmotionClassifier: Trained classifier
+        """
+        artifact = Artifact(directory, 'emotion_classifier', mmap=mmap)
+        metadata = artifact.metadata
+        classifier = cls(metadata['model_type'])
+        
+        if metadata['layout'] == 'joblib':
+            classifier.model = joblib.load(artifact.path('model.joblib'), mmap_mode='r' if mmap else None)
+        else:
+            params = metadata['params']
+            defaults = classifier.model.get_params()
+            # JSON turns tuples into lists
+            params = {name: tuple(value) if isinstance(defaults.get(name), tuple) else value
+                      for name, value in params.items()}
+            classifier.model.set_params(**params)
+            for name, value in metadata['attributes'].items():
+                setattr(classifier.model, name, value)
+            for name in artifact.manifest['arrays']:
+                setattr(classifier.model, name, artifact.array(name))
+        
+        classifier.is_trained = True
+        return classifier
+
 def softmax(X: np.ndarray) -> np.ndarray:
     """Compute softmax values for each set of scores in x."""
     exp_x = np.exp(X - np.max(X, axis=1, keepdims=True))
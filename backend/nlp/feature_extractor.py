@@ -1,21 +1,41 @@
-from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
-from gensim.models import Word2Vec
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer, HashingVectorizer
+from sklearn.preprocessing import normalize
+from gensim.models import Word2Vec, KeyedVectors
 import numpy as np
+from scipy import sparse
 from typing import List, Dict, Any, Union
 import pickle
 import os
+from .artifacts import Artifact, ArtifactWriter, CompactVocabulary, to_json_value
+
+# BoW/TF-IDF features are sparse by default; Word2Vec features are always dense
+FeatureMatrix = Union[np.ndarray, sparse.spmatrix]
 
 class FeatureExtractor:
-    def __init__(self, method: str = 'tfidf', max_features: int = 5000):
+    # Methods backed by a scikit-learn text vectorizer
+    VECTORIZER_METHODS = ['bow', 'tfidf', 'hashing']
+
+    def __init__(self, method: str = 'tfidf', max_features: int = 5000, dense: bool = False,
+                 n_features: int = 2 ** 20, weighting: str = None):
         """Initialize the feature extractor.
         
         Args:
-            method (str): Feature extraction method ('bow', 'tfidf', or 'word2vec')
+            method (str): Feature extraction method ('bow', 'tfidf', 'hashing', or 'word2vec')
             max_features (int): Maximum number of features for BoW and TF-IDF
+            dense (bool): Return dense arrays instead of sparse CSR matrices for vectorizer methods
+            n_features (int): Number of hashed features for the stateless 'hashing' method
+            weighting (str): Word2Vec token weighting for document means (None or 'tfidf')
         """
+        if weighting not in (None, 'tfidf'):
+            raise ValueError(f"Unsupported weighting: {weighting}")
+        
         self.method = method
         self.max_features = max_features
+        self.dense = dense
+        self.weighting = weighting
         self.model = None
+        self.wv = None  # Word vectors, possibly memory-mapped without the full model
+        self.idf = None  # IDF per vocabulary index for 'tfidf' weighting (and artifact-loaded TF-IDF)
         self.vectorizer = None
         
         if method == 'bow':
@@ -28,6 +48,14 @@ class FeatureExtractor:
                 max_features=max_features,
                 stop_words='english'
             )
+        elif method == 'hashing':
+            # Stateless, so it needs no fitting and can vectorize data streamed in chunks;
+            # non-negative counts keep it usable with MultinomialNB
+            self.vectorizer = HashingVectorizer(
+                n_features=n_features,
+                stop_words='english',
+                alternate_sign=False
+            )
         elif method == 'word2vec':
             self.model = None  # Will be trained on the data
         else:
@@ -49,22 +77,77 @@ class FeatureExtractor:
     def load_word2vec(self, path: str):
         """Load a pre-trained Word2Vec model."""
         self.model = Word2Vec.load(path)
+        self.wv = None
+
+    def load_keyed_vectors(self, path: str, mmap: bool = True):
+        """Load only the word vectors, memory-mapped so several processes share one copy."""
+        self.wv = KeyedVectors.load(path, mmap='r' if mmap else None)
+        self.model = None
+
+    def keyed_vectors(self) -> KeyedVectors:
+        return self.wv if self.wv is not None else self.model.wv
+
+    def fit_idf(self, tokenized_texts: List[List[str]]):
+        """Compute IDF weights over the Word2Vec vocabulary."""
+        key_to_index = self.keyed_vectors().key_to_index
+        df = np.zeros(len(key_to_index), dtype=np.float64)
+        for tokens in tokenized_texts:
+            indices = {key_to_index[token] for token in tokens if token in key_to_index}
+            df[list(indices)] += 1
+        # Smoothed IDF, as in scikit-learn's TfidfTransformer
+        self.idf = (np.log((1 + len(tokenized_texts)) / (1 + df)) + 1).astype(np.float32)
+
+    def get_word2vec_vectors(self, tokenized_texts: List[List[str]]) -> np.ndarray:
+        """Get the (optionally TF-IDF weighted) mean Word2Vec vector of each document.
+        
+        All known tokens of the batch are gathered from the vector matrix with a
+        single fancy index, and the per-document sums are segment sums. Documents
+        without known tokens get a zero vector.
+        
+        Returns:
+            np.ndarray: float32 array of shape (n_docs, vector_size)
+        """
+        kv = self.keyed_vectors()
+        key_to_index = kv.key_to_index
+        indices = [[key_to_index[token] for token in tokens if token in key_to_index] for tokens in tokenized_texts]
+        counts = np.fromiter((len(doc) for doc in indices), dtype=np.int64, count=len(indices))
+        flat = np.fromiter((i for doc in indices for i in doc), dtype=np.int64, count=int(counts.sum()))
+        
+        result = np.zeros((len(indices), kv.vector_size), dtype=np.float32)
+        if flat.size == 0:
+            return result
+        
+        vectors = kv.vectors[flat].astype(np.float32, copy=False)
+        if self.weighting == 'tfidf':
+            if self.idf is None:
+                raise ValueError("IDF weights are not fitted; call fit or fit_idf first")
+            # Weighting every occurrence by IDF gives tf * idf per distinct token
+            weights = self.idf[flat]
+            vectors = vectors * weights[:, None]
+        else:
+            weights = np.ones(flat.size, dtype=np.float32)
+        
+        # reduceat needs strictly increasing offsets, so only sum non-empty documents
+        nonempty = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        sums = np.add.reduceat(vectors, starts, axis=0)
+        totals = np.add.reduceat(weights, starts)
+        result[nonempty] = sums / totals[:, None]
+        return result
 
     def get_word2vec_vector(self, tokens: List[str]) -> np.ndarray:
         """Get the average Word2Vec vector for a list of tokens."""
-        vectors = []
-        for token in tokens:
-            try:
-                vectors.append(self.model.wv[token])
-            except KeyError:
-                continue
-        
-        if vectors:
-            return np.mean(vectors, axis=0)
-        return np.zeros(self.model.vector_size)
+        return self.get_word2vec_vectors([tokens])[0]
+
+    @property
+    def is_stateless(self) -> bool:
+        """Whether transform works without fitting (so data can be streamed)."""
+        return self.method == 'hashing'
 
     def fit(self, texts: Union[List[str], List[List[str]]]):
         """Fit the feature extractor on the training data."""
+        if self.is_stateless:
+            return
         if self.method in ['bow', 'tfidf']:
             if isinstance(texts[0], list):
                 # Join tokens if texts are tokenized
@@ -74,42 +157,199 @@ class FeatureExtractor:
             if isinstance(texts[0], str):
                 raise ValueError("Word2Vec requires tokenized texts")
             self.train_word2vec(texts)
+            if self.weighting == 'tfidf':
+                self.fit_idf(texts)
 
-    def transform(self, texts: Union[List[str], List[List[str]]]) -> np.ndarray:
-        """Transform texts to feature vectors."""
-        if self.method in ['bow', 'tfidf']:
+    def transform(self, texts: Union[List[str], List[List[str]]], dense: bool = None) -> FeatureMatrix:
+        """Transform texts to feature vectors.
+        
+        BoW and TF-IDF features stay a sparse CSR matrix unless dense output
+        is requested here or in the constructor.
+        """
+        if self.method in self.VECTORIZER_METHODS:
             if isinstance(texts[0], list):
                 texts = [' '.join(tokens) for tokens in texts]
-            return self.vectorizer.transform(texts).toarray()
+            if isinstance(getattr(self.vectorizer, 'vocabulary_', None), CompactVocabulary):
+                return self._output(self._transform_compact(texts), dense)
+            return self._output(self.vectorizer.transform(texts), dense)
         elif self.method == 'word2vec':
             if isinstance(texts[0], str):
                 raise ValueError("Word2Vec requires tokenized texts")
-            return np.array([self.get_word2vec_vector(tokens) for tokens in texts])
+            return self.get_word2vec_vectors(texts)
 
-    def fit_transform(self, texts: Union[List[str], List[List[str]]]) -> np.ndarray:
+    def fit_transform(self, texts: Union[List[str], List[List[str]]], dense: bool = None) -> FeatureMatrix:
         """Fit and transform in one step."""
+        if self.method in self.VECTORIZER_METHODS:
+            if isinstance(texts[0], list):
+                texts = [' '.join(tokens) for tokens in texts]
+            return self._output(self.vectorizer.fit_transform(texts), dense)
         self.fit(texts)
         return self.transform(texts)
 
+    def _transform_compact(self, texts: List[str]) -> sparse.csr_matrix:
+        """Vectorize against a CompactVocabulary loaded from an artifact.
+        
+        Produces the same matrix as the fitted vectorizer's transform, but resolves
+        each distinct token of the batch with one vectorized lookup.
+        """
+        vectorizer = self.vectorizer
+        vocabulary = vectorizer.vocabulary_
+        analyze = vectorizer.build_analyzer()
+        
+        token_ids: Dict[str, int] = {}
+        flat, counts = [], []
+        for text in texts:
+            tokens = analyze(text)
+            flat.extend(token_ids.setdefault(token, len(token_ids)) for token in tokens)
+            counts.append(len(tokens))
+        
+        columns = vocabulary.lookup(list(token_ids))[np.asarray(flat, dtype=np.int64)]
+        rows = np.repeat(np.arange(len(texts)), counts)
+        known = columns >= 0
+        X = sparse.csr_matrix(
+            (np.ones(int(known.sum()), dtype=vectorizer.dtype), (rows[known], columns[known])),
+            shape=(len(texts), len(vocabulary))
+        )
+        X.sum_duplicates()
+        if vectorizer.binary:
+            X.data.fill(1)
+        
+        if self.method == 'tfidf':
+            X = X.astype(np.float64)
+            if vectorizer.sublinear_tf:
+                np.log(X.data, X.data)
+                X.data += 1
+            if self.idf is not None:
+                X.data *= self.idf[X.indices]
+            if vectorizer.norm:
+                X = normalize(X, norm=vectorizer.norm, copy=False)
+        return X
+
+    def _output(self, X: sparse.spmatrix, dense: bool = None) -> FeatureMatrix:
+        dense = self.dense if dense is None else dense
+        return X.toarray() if dense else X.tocsr()
+
     def get_feature_names(self) -> List[str]:
         """Get feature names (vocabulary) for BoW and TF-IDF."""
         if self.method in ['bow', 'tfidf']:
+            if isinstance(getattr(self.vectorizer, 'vocabulary_', None), CompactVocabulary):
+                return self.vectorizer.vocabulary_.feature_names()
             return self.vectorizer.get_feature_names_out()
         return []
 
     def save(self, path: str):
-        """Save the feature extractor to disk."""
+        """Save the feature extractor to disk.
+        
+        For Word2Vec, the word vectors (and IDF weights) are also saved on
+        their own so load() can memory-map them.
+        """
         if self.method == 'word2vec':
             if self.model:
                 self.model.save(f"{path}_word2vec.model")
+            # sep_limit=0 stores every array in its own .npy file, which load() can memory-map
+            self.keyed_vectors().save(f"{path}_word2vec.kv", sep_limit=0)
+            if self.idf is not None:
+                np.save(f"{path}_word2vec_idf.npy", self.idf)
         else:
             with open(f"{path}_{self.method}.pkl", 'wb') as f:
                 pickle.dump(self.vectorizer, f)
 
-    def load(self, path: str):
-        """Load the feature extractor from disk."""
+    def load(self, path: str, mmap: bool = True):
+        """Load the feature extractor from disk.
+        
+        Args:
+            path (str): Path prefix used with save()
+            mmap (bool): For Word2Vec, memory-map the saved word vectors instead of
+                loading the full model (enough for transform, and shared between processes)
+        """
         if self.method == 'word2vec':
-            self.load_word2vec(f"{path}_word2vec.model")
+            if mmap and os.path.exists(f"{path}_word2vec.kv"):
+                self.load_keyed_vectors(f"{path}_word2vec.kv")
+            else:
+                self.load_word2vec(f"{path}_word2vec.model")
+            if os.path.exists(f"{path}_word2vec_idf.npy"):
+                self.idf = np.load(f"{path}_word2vec_idf.npy", mmap_mode='r' if mmap else None)
         else:
             with open(f"{path}_{self.method}.pkl", 'rb') as f:
-                self.vectorizer = pickle.load(f) 
\ No newline at end of file
+                self.vectorizer = pickle.load(f)
+
+    def save_artifact(self, directory: str):
+        """Save the fitted extractor as a memory-mappable artifact directory.
+        
+        BoW/TF-IDF vocabularies are stored as a CompactVocabulary plus IDF
+        weights instead of a pickled vectorizer (which also carries the
+        stop_words_ set of every pruned term); Word2Vec stores its word
+        vectors as separate .npy files.
+        
+        Args:
+            directory (str): Artifact directory (replaced atomically if it exists)
+        """
+        with ArtifactWriter(directory, 'feature_extractor') as writer:
+            writer.metadata.update({
+                'method': self.method,
+                'max_features': self.max_features,
+                'dense': self.dense,
+                'weighting': self.weighting
+            })
+            if self.vectorizer is not None:
+                params = dict(self.vectorizer.get_params())
+                params['dtype'] = np.dtype(params['dtype']).name
+                try:
+                    writer.metadata['params'] = {name: to_json_value(value) for name, value in params.items()}
+                except TypeError:
+                    raise ValueError("Vectorizers with custom callables cannot be saved as artifacts; use save()")
+            
+            if self.method in ['bow', 'tfidf']:
+                vocabulary = self.vectorizer.vocabulary_
+                if not isinstance(vocabulary, CompactVocabulary):
+                    vocabulary = CompactVocabulary.from_mapping(vocabulary)
+                for name, array in vocabulary.arrays().items():
+                    writer.add_array(name, array)
+                if self.method == 'tfidf' and self.vectorizer.use_idf:
+                    writer.add_array('idf', self.idf if self.idf is not None else self.vectorizer.idf_)
+            elif self.method == 'word2vec':
+                self.keyed_vectors().save(writer.path('word2vec.kv'), sep_limit=0)
+                if self.idf is not None:
+                    writer.add_array('idf', self.idf)
+
+    @classmethod
+    def from_artifact(cls, directory: str, mmap: bool = True) -> 'FeatureExtractor':
+        """Load an extractor saved with save_artifact.
+        
+        Args:
+            directory (str): Artifact directory
+            mmap (bool): Memory-map vocabulary, IDF and word vectors read-only
+            
+        Returns:
+            FeatureExtractor: Extractor ready for transform
+        """
+        artifact = Artifact(directory, 'feature_extractor', mmap=mmap)
+        metadata = artifact.metadata
+        params = dict(metadata.get('params') or {})
+        extractor = cls(
+            method=metadata['method'],
+            max_features=metadata['max_features'],
+            dense=metadata['dense'],
+            n_features=params.get('n_features', 2 ** 20),
+            weighting=metadata['weighting']
+        )
+        
+        if extractor.vectorizer is not None:
+            params['dtype'] = np.dtype(params['dtype']).type
+            defaults = extractor.vectorizer.get_params()
+            extractor.vectorizer.set_params(**{
+                name: tuple(value) if isinstance(defaults.get(name), tuple) else value
+                for name, value in params.items()
+            })
+        
+        if extractor.method in ['bow', 'tfidf']:
+            extractor.vectorizer.vocabulary_ = CompactVocabulary(
+                artifact.array('vocabulary_terms'),
+                artifact.array('vocabulary_columns')
+            )
+            extractor.vectorizer.fixed_vocabulary_ = False
+        elif extractor.method == 'word2vec':
+            extractor.load_keyed_vectors(artifact.path('word2vec.kv'), mmap=mmap)
+        if artifact.has_array('idf'):
+            extractor.idf = artifact.array('idf')
+        return extractor
\ No newline at end of file
@@ -1,63 +1,162 @@
-import re
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict, deque
+from functools import lru_cache
 import nltk
 import spacy
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
-from typing import List, Dict, Any
-
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('wordnet')
+from threadpoolctl import threadpool_limits
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+from .cleaner import TextCleaner
+
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet'
+}
+
+def ensure_nltk_data():
+    """Download required NLTK data if it is missing.
+
+    Called when a TextPreprocessor is created rather than at import time, so
+    importing this module never touches the network.
+    """
+    for name, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(name)
+
+# Per-process preprocessor of the parallel workers, created once by _init_worker
+_worker_preprocessor = None
+_worker_thread_limits = None
+
+def _init_worker(config: Dict[str, Any]):
+    """Pool initializer: load spaCy/NLTK resources once per worker process."""
+    global _worker_preprocessor, _worker_thread_limits
+    # One process per core already; keep numpy/BLAS from oversubscribing it.
+    # The BLAS/OpenMP pools were loaded with this module (through nlp/__init__)
+    # before the initializer runs, so they are limited at runtime: setting
+    # OMP_NUM_THREADS here would come too late
+    _worker_thread_limits = threadpool_limits(limits=1)
+    _worker_preprocessor = TextPreprocessor(**config)
+
+def _preprocess_chunk(texts: List[str]) -> List[Dict[str, Any]]:
+    return _worker_preprocessor.preprocess_batch(texts)
+
+def _chunks(texts: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class TokenCache:
+    """Bounded LRU of cleaned text -> tokens, with hit-rate statistics."""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self.lock:
+            tokens = self.entries.get(key)
+            if tokens is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return list(tokens)
+
+    def put(self, key: str, tokens: List[str]):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = tuple(tokens)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+                'maxSize': self.max_size,
+                'hitRate': self.hits / lookups if lookups else 0.0
+            }
 
 class TextPreprocessor:
-    def __init__(self, use_spacy: bool = True):
+    # Only lemmas and lexical flags are used, so the parser and NER never need to run
+    SPACY_EXCLUDE = ['parser', 'ner']
+
+    def __init__(self, use_spacy: bool = True, batch_size: int = 1000, n_process: int = 1,
+                 cleaner: Optional[TextCleaner] = None, workers: int = 1, chunk_size: int = 1000,
+                 text_cache_size: int = 10000, lemma_cache_size: int = 100000):
         """Initialize the text preprocessor.
         
         Args:
             use_spacy (bool): Whether to use spaCy for preprocessing (True) or NLTK (False)
+            batch_size (int): Number of texts per spaCy nlp.pipe batch
+            n_process (int): Number of processes used by spaCy nlp.pipe
+            cleaner (TextCleaner): Cleaning rules (defaults to TextCleaner())
+            workers (int): Worker processes for preprocess_batch/preprocess_parallel
+                (1 runs in-process, 0 uses every core)
+            chunk_size (int): Texts sent to a worker at a time
+            text_cache_size (int): Cleaned texts whose tokens are memoized (0 disables)
+            lemma_cache_size (int): NLTK tokens whose lemma (or stopword filtering) is memoized
         """
         self.use_spacy = use_spacy
+        self.cleaner = cleaner or TextCleaner()
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.pool = None
+        self.text_cache = TokenCache(text_cache_size)
+        self.lemma_cache_size = lemma_cache_size
+        ensure_nltk_data()
         self.stop_words = set(stopwords.words('english'))
         
         if use_spacy:
             try:
-                self.nlp = spacy.load('en_core_web_sm')
+                self.nlp = spacy.load('en_core_web_sm', exclude=self.SPACY_EXCLUDE)
             except OSError:
                 import subprocess
                 subprocess.run(['python', '-m', 'spacy', 'download', 'en_core_web_sm'])
-                self.nlp = spacy.load('en_core_web_sm')
+                self.nlp = spacy.load('en_core_web_sm', exclude=self.SPACY_EXCLUDE)
         else:
             self.lemmatizer = WordNetLemmatizer()
+            # Comment vocabulary is highly repetitive, so most tokens cost a dict lookup
+            self._token_lemma = lru_cache(maxsize=lemma_cache_size)(self._lemmatize_token)
 
     def clean_text(self, text: str) -> str:
-        """Clean text by removing special characters and extra whitespace."""
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Remove URLs
-        text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-        
-        # Remove email addresses
-        text = re.sub(r'\S+@\S+', '', text)
-        
-        # Remove special characters and numbers
-        text = re.sub(r'[^a-zA-Z\s]', '', text)
-        
-        # Remove extra whitespace
-        text = ' '.join(text.split())
-        
-        return text
+        """Clean text with the configured TextCleaner (URLs, emails, mentions, emoji, non-letters)."""
+        return self.cleaner.clean(text)
 
     def preprocess_spacy(self, text: str) -> List[str]:
         """Preprocess text using spaCy."""
-        doc = self.nlp(text)
+        return self._spacy_tokens(self.nlp(text))
+
+    def _spacy_tokens(self, doc) -> List[str]:
+        """Extract lemmas of the content tokens from a spaCy doc."""
         tokens = []
         
         for token in doc:
@@ -74,14 +173,15 @@ class TextPreprocessor:
         # Tokenize
         tokens = word_tokenize(text)
         
-        # Remove stopwords and lemmatize
-        tokens = [
-            self.lemmatizer.lemmatize(token)
-            for token in tokens
-            if token not in self.stop_words and len(token) > 2
-        ]
-        
-        return tokens
+        # Remove stopwords and lemmatize, memoized per distinct token
+        lemmas = map(self._token_lemma, tokens)
+        return [lemma for lemma in lemmas if lemma is not None]
+
+    def _lemmatize_token(self, token: str) -> Optional[str]:
+        """Lemma of a token, or None if it is a stopword or too short."""
+        if token in self.stop_words or len(token) <= 2:
+            return None
+        return self.lemmatizer.lemmatize(token)
 
     def preprocess(self, text: str) -> Dict[str, Any]:
         """Preprocess the input text.
@@ -95,12 +195,18 @@ class TextPreprocessor:
         # Clean the text
         cleaned_text = self.clean_text(text)
         
-        # Tokenize and lemmatize
-        if self.use_spacy:
-            tokens = self.preprocess_spacy(cleaned_text)
-        else:
-            tokens = self.preprocess_nltk(cleaned_text)
+        # Tokenize and lemmatize, unless this cleaned text was seen before
+        tokens = self.text_cache.get(cleaned_text)
+        if tokens is None:
+            if self.use_spacy:
+                tokens = self.preprocess_spacy(cleaned_text)
+            else:
+                tokens = self.preprocess_nltk(cleaned_text)
+            self.text_cache.put(cleaned_text, tokens)
         
+        return self._result(text, cleaned_text, tokens)
+
+    def _result(self, text: str, cleaned_text: str, tokens: List[str]) -> Dict[str, Any]:
         return {
             'original': text,
             'cleaned': cleaned_text,
@@ -111,10 +217,110 @@ class TextPreprocessor:
     def preprocess_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
         """Preprocess a batch of texts.
         
+        With spaCy, texts are streamed through nlp.pipe using the configured
+        batch_size and n_process. With more than one worker, batches larger
+        than a chunk are sharded across the worker pool.
+        
         Args:
             texts (List[str]): List of texts to preprocess
             
         Returns:
             List[Dict]: List of dictionaries containing original and preprocessed texts
         """
-        return [self.preprocess(text) for text in texts] 
\ No newline at end of file
+        if self.workers > 1 and len(texts) > self.chunk_size:
+            return list(self.preprocess_parallel(texts))
+
+        cleaned_texts = self.cleaner.clean_batch(texts)
+        cached = [self.text_cache.get(cleaned_text) for cleaned_text in cleaned_texts]
+        # Process each distinct uncached text once
+        missing = list(dict.fromkeys(
+            cleaned_text for cleaned_text, tokens in zip(cleaned_texts, cached) if tokens is None
+        ))
+        
+        if self.use_spacy:
+            docs = self.nlp.pipe(missing, batch_size=self.batch_size, n_process=self.n_process)
+            computed = dict(zip(missing, (self._spacy_tokens(doc) for doc in docs)))
+        else:
+            computed = {cleaned_text: self.preprocess_nltk(cleaned_text) for cleaned_text in missing}
+        for cleaned_text, tokens in computed.items():
+            self.text_cache.put(cleaned_text, tokens)
+        
+        return [
+            self._result(text, cleaned_text, tokens if tokens is not None else list(computed[cleaned_text]))
+            for text, cleaned_text, tokens in zip(texts, cleaned_texts, cached)
+        ]
+
+    def preprocess_parallel(self, texts: Iterable[str], max_pending: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Preprocess texts on the worker pool, yielding results in input order.
+        
+        The input is consumed lazily in chunks and at most `max_pending` chunks
+        (default: two per worker) are in flight, so corpora larger than memory
+        can be streamed through.
+        
+        Args:
+            texts (Iterable[str]): Texts to preprocess
+            max_pending (int): Chunks submitted ahead of the one being yielded
+            
+        Yields:
+            Dict: Same dictionaries as preprocess()
+        """
+        pool = self._get_pool()
+        max_pending = max_pending or 2 * self.workers
+        pending = deque()
+        
+        for chunk in _chunks(texts, self.chunk_size):
+            pending.append(pool.apply_async(_preprocess_chunk, (chunk,)))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+    def _get_pool(self):
+        if self.pool is None:
+            # spawn: forking a process with spaCy/BLAS threads loaded is unsafe
+            context = multiprocessing.get_context('spawn')
+            self.pool = context.Pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=({
+                    'use_spacy': self.use_spacy,
+                    'batch_size': self.batch_size,
+                    'cleaner': self.cleaner,
+                    'text_cache_size': self.text_cache.max_size,
+                    'lemma_cache_size': self.lemma_cache_size
+                },)
+            )
+        return self.pool
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit-rate statistics of the text cache and (NLTK) lemma cache of this process."""
+        stats = {'text': self.text_cache.stats()}
+        if not self.use_spacy:
+            info = self._token_lemma.cache_info()
+            lookups = info.hits + info.misses
+            stats['lemma'] = {
+                'hits': info.hits,
+                'misses': info.misses,
+                'size': info.currsize,
+                'maxSize': info.maxsize,
+                'hitRate': info.hits / lookups if lookups else 0.0
+            }
+        return stats
+
+    def clear_caches(self):
+        self.text_cache.clear()
+        if not self.use_spacy:
+            self._token_lemma.cache_clear()
+
+    def close(self):
+        """Shut down the worker pool, if one was started."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self) -> 'TextPreprocessor':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
\ No newline at end of file
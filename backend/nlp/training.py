@@ -0,0 +1,82 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from .preprocessor import TextPreprocessor
+from .feature_extractor import FeatureExtractor
+from .emotion_classifier import EmotionClassifier
+
+def iter_comment_batches(collection, chunk_size: int = 10000, query: Optional[Dict[str, Any]] = None,
+                         text_field: str = 'text', label_field: str = 'emotion') -> Iterator[Tuple[List[str], np.ndarray]]:
+    """Read labelled comments from a MongoDB collection in chunks.
+
+    Args:
+        collection: MongoDB collection (e.g. db.comments)
+        chunk_size (int): Number of comments per chunk
+        query (dict): Extra filter on the comments
+        text_field (str): Field holding the comment text
+        label_field (str): Field holding the emotion label
+
+    Yields:
+        Tuple[List[str], np.ndarray]: Texts and labels of one chunk
+    """
+    query = {**(query or {}), label_field: {'$nin': [None, 'unknown']}}
+    cursor = collection.find(
+        query,
+        {'_id': 0, text_field: 1, label_field: 1}
+    ).batch_size(chunk_size)
+
+    texts, labels = [], []
+    for doc in cursor:
+        texts.append(doc.get(text_field) or '')
+        labels.append(doc[label_field])
+        if len(texts) >= chunk_size:
+            yield texts, np.array(labels)
+            texts, labels = [], []
+    if texts:
+        yield texts, np.array(labels)
+
+def train_out_of_core(collection, classifier: EmotionClassifier, extractor: Optional[FeatureExtractor] = None,
+                      preprocessor: Optional[TextPreprocessor] = None, chunk_size: int = 10000,
+                      query: Optional[Dict[str, Any]] = None, label_field: str = 'emotion',
+                      checkpoint_path: Optional[str] = None, checkpoint_every: int = 10) -> Dict[str, Any]:
+    """Train a classifier on a whole comments collection in bounded memory.
+
+    Comments are streamed in chunks, vectorized with a stateless extractor
+    and fed to partial_fit, with periodic checkpoints via EmotionClassifier.save.
+
+    Args:
+        collection: MongoDB collection of analyzed comments
+        classifier (EmotionClassifier): Classifier supporting incremental training
+        extractor (FeatureExtractor): Stateless feature extractor (defaults to 'hashing')
+        preprocessor (TextPreprocessor): Optional preprocessor applied to each chunk
+        chunk_size (int): Number of comments per chunk
+        query (dict): Extra filter on the comments
+        label_field (str): Field holding the emotion label
+        checkpoint_path (str): Where to save checkpoints, if given
+        checkpoint_every (int): Number of chunks between checkpoints
+
+    Returns:
+        Dict[str, Any]: Training metrics and the label set
+    """
+    extractor = extractor or FeatureExtractor(method='hashing')
+    if not extractor.is_stateless:
+        raise ValueError("Out-of-core training requires a stateless feature extractor ('hashing')")
+
+    # partial_fit needs every label up front
+    filter_query = {**(query or {}), label_field: {'$nin': [None, 'unknown']}}
+    classes = sorted(collection.distinct(label_field, filter_query))
+    if not classes:
+        raise ValueError("No labelled comments to train on")
+
+    def batches():
+        for texts, labels in iter_comment_batches(collection, chunk_size, query, label_field=label_field):
+            if preprocessor is not None:
+                texts = [result['preprocessed'] for result in preprocessor.preprocess_batch(texts)]
+            yield extractor.transform(texts), labels
+
+    metrics = classifier.train_incremental(
+        batches(),
+        classes,
+        checkpoint_path=checkpoint_path,
+        checkpoint_every=checkpoint_every
+    )
+    return {**metrics, 'classes': classes}
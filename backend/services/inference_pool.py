@@ -0,0 +1,430 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing.connection import Client, Listener
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+_STOP = None
+
+def _worker_main(worker_id, requests, results, num_threads):
+    """Inference worker process: load the model once, then serve micro-batches."""
+    # Pin the intra-op thread pools before torch is imported
+    os.environ['OMP_NUM_THREADS'] = str(num_threads)
+    os.environ['MKL_NUM_THREADS'] = str(num_threads)
+    os.environ['ONNX_NUM_THREADS'] = str(num_threads)
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        # The ONNX backend can run without torch
+        pass
+    from services import nlp_service
+
+    try:
+        nlp_service.get_emotion_classifier()
+        results.put(('ready', worker_id, None))
+    except Exception as e:
+        results.put(('failed', worker_id, str(e)))
+        return
+
+    while True:
+        item = requests.get()
+        if item is _STOP:
+            break
+        batch_id, texts = item
+        # Tell the pool which batch this worker holds, so its death fails only that batch
+        results.put(('taken', batch_id, worker_id))
+        try:
+            results.put(('result', batch_id, nlp_service.predict_emotions_local(texts, batch_size=len(texts))))
+        except Exception as e:
+            traceback.print_exc()
+            results.put(('error', batch_id, str(e)))
+
+class InferencePool:
+    """Pool of inference processes fed with micro-batches merged from concurrent callers.
+
+    Requests are merged until `max_batch_size` texts are pending or the oldest
+    request has waited `max_wait_ms`, then sent to whichever worker is free.
+    A worker that dies fails the batch it was running and is replaced, and a
+    prediction waits at most `request_timeout` seconds. Replacements that fail
+    to start are retried with exponential backoff and given up after
+    `max_start_failures` failures in a row.
+
+    The pool belongs to the process that started it. A forked child (e.g. a
+    gunicorn worker) gets a fresh, unstarted pool; to share one pool between
+    web workers, run it as a service (see serve) and set INFERENCE_POOL_ADDRESS.
+    """
+
+    def __init__(self, workers=2, threads_per_worker=1, max_batch_size=32, max_wait_ms=10,
+                 start_timeout=300, request_timeout=120, max_start_failures=5):
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.start_timeout = start_timeout
+        self.request_timeout = request_timeout
+        self.max_start_failures = max_start_failures
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Forget any started state; the threads and worker processes belong to the parent after a fork."""
+        self.pending = queue.Queue()
+        self.in_flight = {}
+        self.assigned = {}
+        self.lock = threading.Lock()
+        self.next_batch_id = 0
+        # Worker ids are never reused, so a late message from a dead worker can't be taken for its replacement's
+        self.next_worker_id = 0
+        self.processes = {}
+        self.ready = set()
+        self.start_failures = 0
+        self.respawn_at = 0.0
+        self.started = False
+        self.counters = {'requests': 0, 'texts': 0, 'batches': 0, 'timeouts': 0, 'workerRestarts': 0}
+
+    def _spawn(self):
+        worker_id = self.next_worker_id
+        self.next_worker_id += 1
+        process = self.context.Process(
+            target=_worker_main,
+            args=(worker_id, self.requests, self.results, self.threads_per_worker),
+            name=f"inference-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self.processes[worker_id] = process
+
+    def start(self):
+        """Spawn the workers and wait until each has loaded the model."""
+        with self.lock:
+            if self.started:
+                return
+            if multiprocessing.parent_process() is not None:
+                # Spawned workers re-import the main module; never let them start pools of their own
+                raise RuntimeError("Inference pool cannot be started from a worker process")
+            self.context = multiprocessing.get_context('spawn')
+            self.requests = self.context.Queue()
+            self.results = self.context.Queue()
+            for _ in range(self.workers):
+                self._spawn()
+
+            deadline = time.monotonic() + self.start_timeout
+            ready = 0
+            while ready < self.workers:
+                kind, worker_id, error = self.results.get(timeout=max(0.0, deadline - time.monotonic()))
+                if kind == 'failed':
+                    self._terminate()
+                    raise RuntimeError(f"Inference worker {worker_id} failed to start: {error}")
+                self.ready.add(worker_id)
+                ready += 1
+
+            threading.Thread(target=self._dispatch, name='inference-dispatch', daemon=True).start()
+            threading.Thread(target=self._collect, name='inference-collect', daemon=True).start()
+            atexit.register(self.shutdown)
+            self.started = True
+            print(f"Started {self.workers} inference workers with {self.threads_per_worker} threads each")
+
+    def submit(self, texts):
+        """Queue texts for prediction and return one future per micro-batch-sized chunk."""
+        self.start()
+        futures = []
+        for start in range(0, len(texts), self.max_batch_size):
+            future = Future()
+            self.pending.put((texts[start:start + self.max_batch_size], future))
+            futures.append(future)
+        with self.lock:
+            self.counters['requests'] += 1
+            self.counters['texts'] += len(texts)
+        return futures
+
+    def predict(self, texts):
+        """Predict emotions for texts; the result is aligned with the input."""
+        deadline = time.monotonic() + self.request_timeout
+        predictions = []
+        for future in self.submit(texts):
+            try:
+                predictions.extend(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                with self.lock:
+                    self.counters['timeouts'] += 1
+                raise RuntimeError(f"Inference timed out after {self.request_timeout}s")
+        return predictions
+
+    def _dispatch(self):
+        while True:
+            texts, future = self.pending.get()
+            batch = [(texts, future)]
+            size = len(texts)
+            deadline = time.monotonic() + self.max_wait
+
+            # Merge further requests until the batch is full or the latency budget is spent
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    texts, future = self.pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if size + len(texts) > self.max_batch_size:
+                    self._send(batch)
+                    batch, size = [], 0
+                batch.append((texts, future))
+                size += len(texts)
+
+            if batch:
+                self._send(batch)
+
+    def _send(self, batch):
+        with self.lock:
+            batch_id = self.next_batch_id
+            self.next_batch_id += 1
+            self.in_flight[batch_id] = batch
+            self.counters['batches'] += 1
+        self.requests.put((batch_id, [text for texts, _ in batch for text in texts]))
+
+    def _collect(self):
+        next_check = time.monotonic() + 1.0
+        while True:
+            if time.monotonic() >= next_check:
+                self._replace_dead_workers()
+                next_check = time.monotonic() + 1.0
+            try:
+                kind, batch_id, payload = self.results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            if kind == 'taken':
+                with self.lock:
+                    if batch_id not in self.in_flight:
+                        continue
+                    if payload in self.processes:
+                        self.assigned[batch_id] = payload
+                        continue
+                    # The worker was already found dead and replaced before this arrived
+                    batch = self.in_flight.pop(batch_id)
+                for _, future in batch:
+                    future.set_exception(RuntimeError("Inference worker died while running the batch"))
+                continue
+            if kind in ('ready', 'failed'):
+                # A replacement worker finished starting (batch_id is its worker id)
+                if kind == 'ready':
+                    with self.lock:
+                        if batch_id in self.processes:
+                            self.ready.add(batch_id)
+                            self.start_failures = 0
+                print(f"Inference worker {batch_id} {'restarted' if kind == 'ready' else 'failed to restart: ' + payload}")
+                continue
+
+            with self.lock:
+                batch = self.in_flight.pop(batch_id, None)
+                self.assigned.pop(batch_id, None)
+            if batch is None:
+                continue
+            if kind == 'error':
+                for _, future in batch:
+                    future.set_exception(RuntimeError(f"Inference failed: {payload}"))
+                continue
+            offset = 0
+            for texts, future in batch:
+                future.set_result(payload[offset:offset + len(texts)])
+                offset += len(texts)
+
+    def _replace_dead_workers(self):
+        """Fail the batches of workers that died (e.g. killed for memory) and start replacements."""
+        with self.lock:
+            if not self.started:
+                return
+            dead = {worker_id: process for worker_id, process in self.processes.items() if not process.is_alive()}
+            failed = []
+            orphaned = []
+            for worker_id, process in dead.items():
+                del self.processes[worker_id]
+                if worker_id not in self.ready:
+                    # Died while loading the model: back off before the next attempt
+                    self.start_failures += 1
+                    self.respawn_at = time.monotonic() + min(60, 2 ** self.start_failures)
+                self.ready.discard(worker_id)
+                for batch_id in [b for b, w in self.assigned.items() if w == worker_id]:
+                    del self.assigned[batch_id]
+                    failed.extend(self.in_flight.pop(batch_id, []))
+                print(f"Inference worker {worker_id} exited with code {process.exitcode}")
+
+            missing = self.workers - len(self.processes)
+            if missing and self.start_failures >= self.max_start_failures:
+                if dead:
+                    print(f"Inference workers failed to start {self.start_failures} times in a row, not restarting them")
+                if not self.processes:
+                    # Nothing will ever take the queued batches
+                    orphaned = [item for batch in self.in_flight.values() for item in batch]
+                    self.in_flight.clear()
+                    self.assigned.clear()
+            elif missing and time.monotonic() >= self.respawn_at:
+                for _ in range(missing):
+                    self._spawn()
+                self.counters['workerRestarts'] += missing
+
+        for _, future in failed:
+            future.set_exception(RuntimeError("Inference worker died while running the batch"))
+        for _, future in orphaned:
+            future.set_exception(RuntimeError("No inference workers are running"))
+
+    def _terminate(self):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        self.processes = {}
+
+    def shutdown(self):
+        if not self.started:
+            return
+        self.started = False
+        for _ in self.processes:
+            self.requests.put(_STOP)
+        for process in self.processes.values():
+            process.join(timeout=5)
+        self._terminate()
+
+    def stats(self):
+        with self.lock:
+            return {
+                **self.counters,
+                'workers': self.workers,
+                'threadsPerWorker': self.threads_per_worker,
+                'avgBatchSize': self.counters['texts'] / self.counters['batches'] if self.counters['batches'] else 0.0,
+                'inFlight': len(self.in_flight),
+                'startFailures': self.start_failures,
+                'aliveWorkers': sum(1 for process in self.processes.values() if process.is_alive())
+            }
+
+def parse_address(address):
+    """'host:port' for TCP, anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and '/' not in address:
+        return (host or '127.0.0.1', int(port))
+    return address
+
+def get_authkey():
+    authkey = os.getenv('INFERENCE_POOL_AUTHKEY')
+    if not authkey:
+        # Connections exchange pickles, so they must be authenticated
+        raise RuntimeError("INFERENCE_POOL_AUTHKEY must be set to use a shared inference pool")
+    return authkey.encode('utf-8')
+
+def _serve_connection(pool, conn):
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if message[0] == 'predict':
+                    conn.send(('ok', pool.predict(message[1])))
+                elif message[0] == 'stats':
+                    conn.send(('ok', pool.stats()))
+                else:
+                    conn.send(('error', f"Unknown request {message[0]!r}"))
+            except Exception as e:
+                conn.send(('error', str(e)))
+
+def serve(pool, address, authkey):
+    """Serve a started pool to RemoteInferencePool clients, one thread per connection.
+
+    Requests from every connected web worker are merged into the same micro-batches.
+    """
+    with Listener(parse_address(address), authkey=authkey) as listener:
+        print(f"Inference pool listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print(f"Warning: Rejected inference pool connection: {e}")
+                continue
+            threading.Thread(target=_serve_connection, args=(pool, conn), daemon=True).start()
+
+class RemoteInferencePool:
+    """Client of a pool run with `python -m services.inference_pool`.
+
+    Each thread keeps its own connection; it is opened lazily, so a client
+    created before a fork is safe to use in the child.
+    """
+
+    def __init__(self, address, authkey, request_timeout=120):
+        self.address = address
+        self.authkey = authkey
+        self.request_timeout = request_timeout
+        self.local = threading.local()
+
+    def _request(self, message):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or getattr(self.local, 'pid', None) != os.getpid():
+            conn = Client(parse_address(self.address), authkey=self.authkey)
+            self.local.conn, self.local.pid = conn, os.getpid()
+        try:
+            conn.send(message)
+            if not conn.poll(self.request_timeout):
+                raise TimeoutError(f"Inference pool did not answer within {self.request_timeout}s")
+            status, payload = conn.recv()
+        except Exception:
+            # The connection may hold a late answer or be broken; never reuse it
+            self.local.conn = None
+            conn.close()
+            raise
+        if status != 'ok':
+            raise RuntimeError(f"Inference failed: {payload}")
+        return payload
+
+    def predict(self, texts):
+        return self._request(('predict', list(texts)))
+
+    def stats(self):
+        return {**self._request(('stats',)), 'address': self.address}
+
+def create_inference_pool(workers):
+    """Create a pool sized from the INFERENCE_* environment variables."""
+    threads = int(os.getenv('INFERENCE_THREADS_PER_WORKER', max(1, (os.cpu_count() or 1) // workers)))
+    return InferencePool(
+        workers=workers,
+        threads_per_worker=threads,
+        max_batch_size=int(os.getenv('INFERENCE_MAX_BATCH', os.getenv('EMOTION_BATCH_SIZE', 32))),
+        max_wait_ms=float(os.getenv('INFERENCE_MAX_WAIT_MS', 10)),
+        start_timeout=int(os.getenv('INFERENCE_START_TIMEOUT', 300)),
+        request_timeout=int(os.getenv('INFERENCE_REQUEST_TIMEOUT', 120))
+    )
+
+def connect_inference_pool(address):
+    """Client of the shared pool at `address`; fails fast if it is not reachable."""
+    pool = RemoteInferencePool(
+        address,
+        get_authkey(),
+        request_timeout=int(os.getenv('INFERENCE_REQUEST_TIMEOUT', 120))
+    )
+    pool.stats()
+    return pool
+
+def main():
+    """Run the pool as a service shared by every web worker:
+
+        INFERENCE_WORKERS=2 INFERENCE_POOL_ADDRESS=127.0.0.1:6100 INFERENCE_POOL_AUTHKEY=... \\
+            python -m services.inference_pool
+    """
+    address = os.getenv('INFERENCE_POOL_ADDRESS', '127.0.0.1:6100')
+    authkey = get_authkey()
+    pool = create_inference_pool(max(1, int(os.getenv('INFERENCE_WORKERS', 2))))
+    pool.start()
+    serve(pool, address, authkey)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+class Job:
+    """A single video analysis job and its progress counters."""
+
+    def __init__(self, video_id, options=None):
+        self.id = uuid.uuid4().hex
+        self.video_id = video_id
+        self.options = options or {}
+        self.status = 'queued'
+        self.progress = {'fetched': 0, 'analyzed': 0, 'saved': 0, 'failed': 0}
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+        self.store = None
+
+    @classmethod
+    def from_document(cls, doc):
+        """Rebuild a job (e.g. one run by another server process) from its stored record."""
+        job = cls(doc['videoId'], doc.get('options'))
+        job.id = doc['_id']
+        job.status = doc['status']
+        job.progress = {**job.progress, **doc.get('progress', {})}
+        job.error = doc.get('error')
+        job.created_at = doc['createdAt']
+        job.started_at = doc.get('startedAt')
+        job.finished_at = doc.get('finishedAt')
+        return job
+
+    def to_document(self):
+        with self.lock:
+            return {
+                '_id': self.id,
+                'videoId': self.video_id,
+                'options': self.options,
+                'status': self.status,
+                'progress': dict(self.progress),
+                'error': self.error,
+                'createdAt': self.created_at,
+                'startedAt': self.started_at,
+                'finishedAt': self.finished_at,
+                'heartbeatAt': datetime.utcnow()
+            }
+
+    def increment(self, **counts):
+        """Add to the progress counters, e.g. job.increment(fetched=100)."""
+        with self.lock:
+            for name, value in counts.items():
+                self.progress[name] = self.progress.get(name, 0) + value
+        if self.store is not None:
+            self.store.increment(self.id, counts)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'jobId': self.id,
+                'videoId': self.video_id,
+                'status': self.status,
+                'progress': dict(self.progress),
+                'error': self.error,
+                'createdAt': self.created_at.isoformat() + 'Z',
+                'startedAt': self.started_at.isoformat() + 'Z' if self.started_at else None,
+                'finishedAt': self.finished_at.isoformat() + 'Z' if self.finished_at else None
+            }
+
+class MongoJobStore:
+    """Job records shared by all server processes through a MongoDB collection.
+
+    Jobs still run on the worker threads of the process that queued them; the
+    records let any process answer GET /jobs/<id> and find a video's active
+    job. Each process renews `heartbeatAt` on its active jobs, so the job of a
+    process that died is reported as failed once the heartbeat is
+    `stale_seconds` old.
+    """
+
+    def __init__(self, collection, stale_seconds=60):
+        self.collection = collection
+        self.stale_seconds = stale_seconds
+
+    def _write(self, action, func):
+        # Job records are bookkeeping: a failed write must not fail the job itself
+        try:
+            func()
+        except Exception as e:
+            print(f"Warning: Error {action} job record: {e}")
+
+    def insert(self, job):
+        self._write('saving', lambda: self.collection.insert_one(job.to_document()))
+
+    def update(self, job):
+        doc = job.to_document()
+        # Progress is only ever changed with $inc, so concurrent increments are kept
+        doc.pop('progress')
+        self._write('updating', lambda: self.collection.update_one({'_id': doc.pop('_id')}, {'$set': doc}))
+
+    def increment(self, job_id, counts):
+        self._write('updating', lambda: self.collection.update_one(
+            {'_id': job_id},
+            {'$inc': {f'progress.{name}': value for name, value in counts.items()}}
+        ))
+
+    def heartbeat(self, job_ids):
+        if job_ids:
+            self._write('renewing', lambda: self.collection.update_many(
+                {'_id': {'$in': list(job_ids)}, 'status': {'$in': list(ACTIVE_STATUSES)}},
+                {'$set': {'heartbeatAt': datetime.utcnow()}}
+            ))
+
+    def _job(self, doc):
+        job = Job.from_document(doc)
+        stale = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        if job.status in ACTIVE_STATUSES and doc.get('heartbeatAt', job.created_at) < stale:
+            job.status = 'failed'
+            job.error = 'The server process running this job stopped'
+        return job
+
+    def get(self, job_id):
+        doc = self.collection.find_one({'_id': job_id})
+        return self._job(doc) if doc else None
+
+    def find_active(self, video_id):
+        doc = self.collection.find_one(
+            {
+                'videoId': video_id,
+                'status': {'$in': list(ACTIVE_STATUSES)},
+                'heartbeatAt': {'$gte': datetime.utcnow() - timedelta(seconds=self.stale_seconds)}
+            },
+            sort=[('createdAt', -1)]
+        )
+        return self._job(doc) if doc else None
+
+class JobQueue:
+    """In-process analysis queue served by a pool of background worker threads.
+
+    With a `store` (see MongoJobStore) job records are shared with the other
+    server processes, so a job can be looked up from any of them.
+    """
+
+    def __init__(self, handler, workers=2, history_size=1000, store=None):
+        self.handler = handler
+        self.workers = workers
+        self.history_size = history_size
+        self.store = store
+        self.jobs = OrderedDict()
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        # Serializes find_or_submit, so one process never queues a video twice
+        self.submit_lock = threading.Lock()
+        self.threads = []
+
+    def start(self):
+        """Start the worker threads if they are not running yet."""
+        with self.lock:
+            if self.threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"analysis-worker-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            if self.store is not None:
+                thread = threading.Thread(target=self._heartbeat, name='analysis-heartbeat', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def _add(self, job):
+        job.store = self.store
+        with self.lock:
+            self.jobs[job.id] = job
+            self._trim_history()
+        if self.store is not None:
+            self.store.insert(job)
+        self.pending.put(job)
+
+    def submit(self, video_id, **options):
+        """Queue a video for analysis and return its job."""
+        self.start()
+        job = Job(video_id, options)
+        self._add(job)
+        return job
+
+    def find_or_submit(self, video_id, **options):
+        """Return the video's queued or running job, or queue a new one.
+
+        Jobs of other server processes are found through the store; two
+        processes racing here can still both queue one, and the ingestion
+        lease then makes the second one wait for the first.
+
+        Returns:
+            tuple: (job, created)
+        """
+        self.start()
+        with self.submit_lock:
+            job = self.find_active(video_id)
+            if job is not None:
+                return job, False
+            job = Job(video_id, options)
+            self._add(job)
+        return job, True
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None and self.store is not None:
+            try:
+                job = self.store.get(job_id)
+            except Exception as e:
+                print(f"Warning: Error reading job records: {e}")
+        return job
+
+    def find_active(self, video_id):
+        """Return a queued or running job for the video, if there is one."""
+        with self.lock:
+            job = self._find_active(video_id)
+        if job is None and self.store is not None:
+            try:
+                job = self.store.find_active(video_id)
+            except Exception as e:
+                print(f"Warning: Error reading job records: {e}")
+        return job
+
+    def _find_active(self, video_id):
+        for job in reversed(self.jobs.values()):
+            if job.video_id == video_id and job.status in ACTIVE_STATUSES:
+                return job
+        return None
+
+    def _trim_history(self):
+        # Forget the oldest finished jobs once the history is full
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in ('completed', 'failed')]
+        for job_id in finished[:max(0, len(self.jobs) - self.history_size)]:
+            del self.jobs[job_id]
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.store.stale_seconds / 3)
+            with self.lock:
+                active = [job.id for job in self.jobs.values() if job.status in ACTIVE_STATUSES]
+            self.store.heartbeat(active)
+
+    def _set_state(self, job, **fields):
+        with job.lock:
+            for name, value in fields.items():
+                setattr(job, name, value)
+        if self.store is not None:
+            self.store.update(job)
+
+    def _work(self):
+        while True:
+            job = self.pending.get()
+            self._set_state(job, status='running', started_at=datetime.utcnow())
+            try:
+                self.handler(job)
+                status, error = 'completed', None
+            except Exception as e:
+                print(f"Error in analysis job {job.id}: {str(e)}")
+                traceback.print_exc()
+                status, error = 'failed', str(e)
+            self._set_state(job, status=status, error=error, finished_at=datetime.utcnow())
+            self.pending.task_done()
+
+def create_job_queue(handler, collection=None):
+    """Create a job queue sized from ANALYSIS_WORKERS and JOB_HISTORY_SIZE.
+
+    With a collection, job records are kept there (MongoJobStore) so every
+    server process can answer for every job.
+    """
+    store = None
+    if collection is not None:
+        store = MongoJobStore(collection, stale_seconds=int(os.getenv('JOB_STALE_SECONDS', 60)))
+    return JobQueue(
+        handler,
+        workers=int(os.getenv('ANALYSIS_WORKERS', 2)),
+        history_size=int(os.getenv('JOB_HISTORY_SIZE', 1000)),
+        store=store
+    )
\ No newline at end of file
@@ -0,0 +1,69 @@
+import threading
+import time
+import traceback
+
+class ModelRegistry:
+    """Loads models lazily on first use, or all at once in an explicit warmup."""
+
+    def __init__(self):
+        self.loaders = {}
+        self.models = {}
+        self.load_times = {}
+        self.errors = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, loader):
+        """Register a zero-argument loader for a model."""
+        with self.lock:
+            self.loaders[name] = loader
+            self.locks[name] = threading.Lock()
+
+    def get(self, name):
+        """Return the model, loading it on first use."""
+        model = self.models.get(name)
+        if model is not None:
+            return model
+
+        with self.locks[name]:
+            if name not in self.models:
+                start = time.perf_counter()
+                try:
+                    self.models[name] = self.loaders[name]()
+                    self.errors.pop(name, None)
+                except Exception as e:
+                    self.errors[name] = str(e)
+                    raise
+                self.load_times[name] = time.perf_counter() - start
+                print(f"Loaded model '{name}' in {self.load_times[name]:.2f}s")
+        return self.models[name]
+
+    def warmup(self, names=None):
+        """Load the given models (all registered ones by default)."""
+        for name in names or list(self.loaders):
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Error warming up model '{name}': {str(e)}")
+                traceback.print_exc()
+        return self.is_ready(names)
+
+    def warmup_in_background(self, names=None):
+        thread = threading.Thread(target=self.warmup, args=(names,), name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self, names=None):
+        return all(name in self.models for name in names or self.loaders)
+
+    def status(self):
+        return {
+            name: {
+                'loaded': name in self.models,
+                'loadSeconds': self.load_times.get(name),
+                'error': self.errors.get(name)
+            }
+            for name in self.loaders
+        }
+
+registry = ModelRegistry()
@@ -1,93 +1,379 @@
-import spacy
-from transformers import pipeline
 import numpy as np
 import os
-import torch
-
-# Load spaCy model
-try:
-    nlp = spacy.load('en_core_web_sm')
-except OSError:
-    print("Downloading spaCy model...")
-    os.system("python -m spacy download en_core_web_sm")
-    nlp = spacy.load('en_core_web_sm')
-
-# Initialize emotion classifier with specific device placement
-device = 0 if torch.cuda.is_available() else -1
-try:
-    emotion_classifier = pipeline(
-        "text-classification",
-        model="j-hartmann/emotion-english-distilroberta-base",
-        return_all_scores=True,
-        device=device
-    )
-except Exception as e:
-    print(f"Warning: Error loading emotion classifier: {e}")
-    print("Attempting to load with CPU only...")
-    emotion_classifier = pipeline(
-        "text-classification",
-        model="j-hartmann/emotion-english-distilroberta-base",
-        return_all_scores=True,
-        device=-1
-    )
+import copy
+from services.model_registry import registry
+from services.prediction_cache import PredictionCache, cache_key
 
-def preprocess_text(text):
-    """Preprocess text using spaCy."""
+EMOTION_MODEL = os.getenv('EMOTION_MODEL', 'j-hartmann/emotion-english-distilroberta-base')
+
+# Inference backend: 'torch' (transformers pipeline) or 'onnx' (exported with services/onnx_backend.py)
+EMOTION_BACKEND = os.getenv('EMOTION_BACKEND', 'torch').lower()
+
+def load_spacy_model():
+    """Load the spaCy model; it must be installed ahead of time.
+
+    The dependency parser is excluded: stopword and punctuation flags are
+    lexical, and nothing we store needs parses or sentence boundaries.
+    """
+    import spacy
+    try:
+        return spacy.load('en_core_web_sm', exclude=['parser'])
+    except OSError as e:
+        raise OSError(
+            "spaCy model 'en_core_web_sm' is not installed. "
+            "Run: python -m spacy download en_core_web_sm"
+        ) from e
+
+def load_emotion_classifier():
+    """Load the emotion classifier for the configured backend."""
+    if EMOTION_BACKEND == 'onnx':
+        from services.onnx_backend import DEFAULT_MODEL_DIR, OnnxEmotionClassifier
+        threads = os.getenv('ONNX_NUM_THREADS')
+        return OnnxEmotionClassifier(
+            os.getenv('ONNX_MODEL_DIR', DEFAULT_MODEL_DIR),
+            num_threads=int(threads) if threads else None
+        )
+    if EMOTION_BACKEND != 'torch':
+        raise ValueError(f"Unsupported emotion backend: {EMOTION_BACKEND}")
+    return load_torch_classifier()
+
+def load_torch_classifier():
+    """Load the transformers pipeline with specific device placement."""
+    import torch
+    from transformers import pipeline
+
+    device = 0 if torch.cuda.is_available() else -1
     try:
-        doc = nlp(text)
-        # Basic preprocessing: lowercase, remove stopwords and punctuation
-        tokens = [token.lemma_.lower() for token in doc 
-                if not token.is_stop and not token.is_punct]
-        return {
-            'original': text,
-            'preprocessed': ' '.join(tokens),
-            'tokens': tokens,
-            'entities': [(ent.text, ent.label_) for ent in doc.ents]
-        }
+        return pipeline(
+            "text-classification",
+            model=EMOTION_MODEL,
+            return_all_scores=True,
+            device=device
+        )
+    except Exception as e:
+        print(f"Warning: Error loading emotion classifier: {e}")
+        print("Attempting to load with CPU only...")
+        return pipeline(
+            "text-classification",
+            model=EMOTION_MODEL,
+            return_all_scores=True,
+            device=-1
+        )
+
+# Number of inference worker processes; 0 runs the classifier in this process
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 0))
+# Address of a shared pool (python -m services.inference_pool); overrides INFERENCE_WORKERS
+INFERENCE_POOL_ADDRESS = os.getenv('INFERENCE_POOL_ADDRESS')
+USE_INFERENCE_POOL = INFERENCE_WORKERS > 0 or bool(INFERENCE_POOL_ADDRESS)
+
+def start_inference_pool():
+    """Connect to the shared pool, or start this process's workers and wait until their models are loaded."""
+    from services.inference_pool import create_inference_pool, connect_inference_pool
+    if INFERENCE_POOL_ADDRESS:
+        return connect_inference_pool(INFERENCE_POOL_ADDRESS)
+    pool = create_inference_pool(INFERENCE_WORKERS)
+    pool.start()
+    return pool
+
+# Models are loaded on first use or by an explicit registry.warmup()
+registry.register('spacy', load_spacy_model)
+registry.register('emotion_classifier', load_emotion_classifier)
+registry.register('inference_pool', start_inference_pool)
+
+# Models this process needs to serve requests
+ACTIVE_MODELS = ['spacy', 'inference_pool' if USE_INFERENCE_POOL else 'emotion_classifier']
+
+def get_nlp():
+    return registry.get('spacy')
+
+def get_emotion_classifier():
+    return registry.get('emotion_classifier')
+
+def get_inference_pool():
+    """The inference worker pool, or None when inference runs in-process."""
+    return registry.get('inference_pool') if USE_INFERENCE_POOL else None
+
+# Batched inference settings
+BATCH_SIZE = int(os.getenv('EMOTION_BATCH_SIZE', 32))
+
+def get_max_length():
+    """Maximum number of tokens per text passed to the classifier."""
+    if os.getenv('EMOTION_MAX_LENGTH'):
+        return int(os.getenv('EMOTION_MAX_LENGTH'))
+    return min(get_emotion_classifier().tokenizer.model_max_length, 512)
+
+# Identifier stored with every analysis and used to key cached predictions;
+# quantized ONNX scores differ slightly, so they are cached separately
+MODEL_VERSION = os.getenv(
+    'EMOTION_MODEL_VERSION',
+    'distilroberta-base-onnx' if EMOTION_BACKEND == 'onnx' else 'distilroberta-base'
+)
+
+# Score post-processing: keep only the top-k emotions in allEmotions (0 keeps all),
+# or store all scores as one packed float32 array in label order (compact layout)
+EMOTION_TOP_K = int(os.getenv('EMOTION_TOP_K', 0))
+COMPACT_SCORES = os.getenv('COMPACT_SCORES', 'false').lower() == 'true'
+
+# Label order of each model's packed scores, filled in as predictions come back
+MODEL_LABELS = {}
+
+# Cached results depend on the model and on the stored score layout
+CACHE_NAMESPACE = f"{MODEL_VERSION}:{'compact' if COMPACT_SCORES else f'top{EMOTION_TOP_K}'}"
+
+# In-process prediction cache; app.py attaches the persistent tier
+prediction_cache = PredictionCache(max_size=int(os.getenv('PREDICTION_CACHE_SIZE', 10000)))
+
+# Batched preprocessing settings
+SPACY_BATCH_SIZE = int(os.getenv('SPACY_BATCH_SIZE', 256))
+SPACY_N_PROCESS = int(os.getenv('SPACY_N_PROCESS', 1))
+PREPROCESS_OUTPUTS = tuple(
+    output.strip() for output in os.getenv('PREPROCESS_OUTPUTS', 'lemmas,entities').split(',') if output.strip()
+)
+
+# Pipeline components each optional output depends on
+OUTPUT_COMPONENTS = {
+    'lemmas': {'tok2vec', 'tagger', 'attribute_ruler', 'lemmatizer'},
+    'entities': {'tok2vec', 'ner'}
+}
+
+def get_disabled_components(nlp, outputs):
+    """Pipeline components that are not needed for the requested outputs."""
+    needed = set()
+    for output in outputs:
+        if output not in OUTPUT_COMPONENTS:
+            raise ValueError(f"Unsupported preprocessing output: {output}")
+        needed |= OUTPUT_COMPONENTS[output]
+    return [name for name in nlp.pipe_names if name not in needed]
+
+def _fallback_preprocessed(text):
+    return {
+        'original': text,
+        'preprocessed': text.lower(),
+        'tokens': text.lower().split(),
+        'entities': []
+    }
+
+def preprocess_texts(texts, outputs=None, batch_size=None, n_process=None):
+    """Preprocess texts in batches with spaCy's nlp.pipe.
+
+    Args:
+        texts: Texts to preprocess
+        outputs: Which optional outputs to compute, from 'lemmas' and 'entities'.
+            Tokens are always returned; without 'lemmas' they are the lowercased
+            token text. Components only needed for other outputs are disabled.
+        batch_size: Texts per nlp.pipe batch
+        n_process: Number of processes for nlp.pipe
+
+    Returns:
+        list: One dict per text with original, preprocessed, tokens and entities
+    """
+    outputs = PREPROCESS_OUTPUTS if outputs is None else tuple(outputs)
+    if not texts:
+        return []
+
+    try:
+        nlp = get_nlp()
+        docs = nlp.pipe(
+            texts,
+            batch_size=batch_size or SPACY_BATCH_SIZE,
+            n_process=n_process or SPACY_N_PROCESS,
+            disable=get_disabled_components(nlp, outputs)
+        )
+
+        results = []
+        for text, doc in zip(texts, docs):
+            # Basic preprocessing: lowercase, remove stopwords and punctuation
+            tokens = [
+                (token.lemma_ if 'lemmas' in outputs else token.text).lower()
+                for token in doc
+                if not token.is_stop and not token.is_punct
+            ]
+            results.append({
+                'original': text,
+                'preprocessed': ' '.join(tokens),
+                'tokens': tokens,
+                'entities': [(ent.text, ent.label_) for ent in doc.ents] if 'entities' in outputs else []
+            })
+        return results
     except Exception as e:
         print(f"Warning: Error in text preprocessing: {e}")
-        return {
-            'original': text,
-            'preprocessed': text.lower(),
-            'tokens': text.lower().split(),
-            'entities': []
-        }
-
-def analyze_emotions(comments):
+        return [_fallback_preprocessed(text) for text in texts]
+
+def preprocess_text(text, outputs=None):
+    """Preprocess text using spaCy."""
+    return preprocess_texts([text], outputs=outputs)[0]
+
+def _sort_by_length(texts):
+    """Return text indices ordered by token length so batches need little padding."""
+    try:
+        encoded = get_emotion_classifier().tokenizer(
+            texts,
+            truncation=True,
+            max_length=get_max_length()
+        )['input_ids']
+        lengths = [len(ids) for ids in encoded]
+    except Exception as e:
+        print(f"Warning: Error measuring token lengths: {e}")
+        lengths = [len(text) for text in texts]
+    return sorted(range(len(texts)), key=lambda i: lengths[i])
+
+def predict_emotions(texts, batch_size=None):
+    """Predict emotions for texts, through the inference pool when one is configured.
+
+    Returns a list aligned with `texts`; an entry is None if its prediction failed.
+    """
+    pool = get_inference_pool()
+    if pool is None:
+        return predict_emotions_local(texts, batch_size)
+    if not texts:
+        return []
+    try:
+        return pool.predict(texts)
+    except Exception as e:
+        print(f"Warning: Error in pooled prediction: {e}")
+        return [None] * len(texts)
+
+def predict_emotions_local(texts, batch_size=None):
+    """Run the emotion classifier in this process over texts in length-sorted batches.
+
+    Returns a list aligned with `texts`; an entry is None if its prediction failed.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    emotion_classifier = get_emotion_classifier()
+    max_length = get_max_length()
+    predictions = [None] * len(texts)
+    order = _sort_by_length(texts)
+
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        batch = [texts[i] for i in indices]
+        try:
+            results = emotion_classifier(
+                batch,
+                batch_size=len(batch),
+                truncation=True,
+                max_length=max_length
+            )
+            for i, result in zip(indices, results):
+                predictions[i] = result
+        except Exception as e:
+            print(f"Warning: Error in batch prediction, retrying one by one: {e}")
+            for i in indices:
+                try:
+                    predictions[i] = emotion_classifier(
+                        texts[i],
+                        truncation=True,
+                        max_length=max_length
+                    )[0]
+                except Exception as e:
+                    print(f"Warning: Error analyzing comment: {e}")
+
+    return predictions
+
+def predictions_to_matrix(predictions):
+    """Convert per-text lists of {'label', 'score'} into (labels, n_texts x n_labels score matrix).
+
+    The classifier returns every label in the same (model) order, so the first
+    row fixes the column order.
+    """
+    labels = [p['label'].lower() for p in predictions[0]]
+    scores = np.array(
+        [[p['score'] for p in comment_predictions] for comment_predictions in predictions],
+        dtype=np.float64
+    )
+    return labels, scores
+
+def top_emotions(scores, k=0):
+    """Select the top emotion, its confidence and optionally the top-k emotions for every row at once.
+
+    Returns:
+        dict: 'best' and 'confidence' per row, plus 'indices'/'scores' of the
+        top-k labels per row (all labels in model order when k is 0)
+    """
+    rows = np.arange(scores.shape[0])
+    best = scores.argmax(axis=1)
+    if k and k < scores.shape[1]:
+        # Partition out the k largest, then sort just those
+        indices = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-scores[rows[:, None], indices], axis=1)
+        indices = indices[rows[:, None], order]
+    else:
+        indices = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    return {
+        'best': best.tolist(),
+        'confidence': scores[rows, best].tolist(),
+        'indices': indices.tolist(),
+        'scores': scores[rows[:, None], indices].tolist()
+    }
+
+def pack_scores(scores):
+    """Pack a row of scores into float32 bytes (stored as BSON binary)."""
+    return np.asarray(scores, dtype=np.float32).tobytes()
+
+def unpack_scores(packed):
+    """Unpack scores stored with pack_scores."""
+    return np.frombuffer(packed, dtype=np.float32)
+
+def analyze_emotions(comments, batch_size=None, use_cache=True):
     """Analyze emotions in comments using the emotion classifier."""
     try:
-        analyzed_comments = []
-        
-        for comment in comments:
-            try:
-                # Preprocess text
-                preprocessed = preprocess_text(comment['text'])
-                
-                # Get emotion predictions
-                predictions = emotion_classifier(comment['text'])[0]
-                
-                # Find the emotion with highest confidence
-                max_emotion = max(predictions, key=lambda x: x['score'])
-                
-                # Add emotion analysis to comment
-                analyzed_comment = {
-                    **comment,  # Keep all original comment data
-                    'emotion': max_emotion['label'].lower(),
-                    'emotionConfidence': float(max_emotion['score']),
-                    'emotionAnalysis': {
-                        'preprocessedText': preprocessed['preprocessed'],
-                        'entities': preprocessed['entities'],
-                        'allEmotions': [
-                            {'emotion': p['label'].lower(), 'confidence': float(p['score'])}
-                            for p in predictions
-                        ],
-                        'modelVersion': 'distilroberta-base',
-                        'analyzedAt': None  # Will be set by MongoDB
-                    }
+        keys = [cache_key(comment['text'], CACHE_NAMESPACE) for comment in comments]
+        cached = prediction_cache.get_many(keys) if use_cache else {}
+
+        # Only run the models on texts that are not cached yet
+        pending = {}
+        for key, comment in zip(keys, comments):
+            if key not in cached and key not in pending:
+                pending[key] = comment['text']
+
+        pending_keys = list(pending)
+        pending_texts = [pending[key] for key in pending_keys]
+        predictions = predict_emotions(pending_texts, batch_size)
+        preprocessed_texts = preprocess_texts(pending_texts)
+
+        fresh = {}
+        valid = [i for i, comment_predictions in enumerate(predictions) if comment_predictions]
+        if len(valid) < len(predictions):
+            print(f"Warning: Error analyzing {len(predictions) - len(valid)} comments: no prediction returned")
+
+        if valid:
+            labels, scores = predictions_to_matrix([predictions[i] for i in valid])
+            MODEL_LABELS[MODEL_VERSION] = labels
+            top = top_emotions(scores, EMOTION_TOP_K)
+
+            for row, i in enumerate(valid):
+                key = pending_keys[i]
+                preprocessed = preprocessed_texts[i]
+                analysis = {
+                    'preprocessedText': preprocessed['preprocessed'],
+                    'entities': preprocessed['entities'],
+                    'modelVersion': MODEL_VERSION,
+                    'analyzedAt': None  # Will be set by MongoDB
+                }
+                if COMPACT_SCORES:
+                    analysis['scores'] = pack_scores(scores[row])
+                else:
+                    analysis['allEmotions'] = [
+                        {'emotion': labels[label], 'confidence': confidence}
+                        for label, confidence in zip(top['indices'][row], top['scores'][row])
+                    ]
+
+                fresh[key] = {
+                    'emotion': labels[top['best'][row]],
+                    'emotionConfidence': top['confidence'][row],
+                    'emotionAnalysis': analysis
                 }
-                analyzed_comments.append(analyzed_comment)
-            except Exception as e:
-                print(f"Warning: Error analyzing comment: {e}")
+
+        if use_cache:
+            prediction_cache.set_many(fresh, CACHE_NAMESPACE)
+
+        analyzed_comments = []
+        for key, comment in zip(keys, comments):
+            result = cached.get(key) or fresh.get(key)
+            if result:
+                # Keep all original comment data and add the emotion analysis
+                analyzed_comments.append({**comment, **copy.deepcopy(result)})
+            else:
                 # Add comment with default values if analysis fails
                 analyzed_comments.append({
                     **comment,
@@ -96,8 +382,8 @@ def analyze_emotions(comments):
                     'emotionAnalysis': {
                         'preprocessedText': comment['text'],
                         'entities': [],
-                        'allEmotions': [],
-                        'modelVersion': 'distilroberta-base',
+                        **({'scores': b''} if COMPACT_SCORES else {'allEmotions': []}),
+                        'modelVersion': MODEL_VERSION,
                         'analyzedAt': None
                     }
                 })
@@ -0,0 +1,196 @@
+"""ONNX Runtime backend for the emotion classifier.
+
+Export the model once (dynamic int8 quantization by default) and check it
+against the torch pipeline:
+
+    python -m services.onnx_backend --output onnx/emotion-distilroberta
+
+Then set EMOTION_BACKEND=onnx (and ONNX_MODEL_DIR if you used another path).
+"""
+import argparse
+import json
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_MODEL_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'onnx', 'emotion-distilroberta'
+)
+FP32_FILE = 'model.onnx'
+INT8_FILE = 'model.int8.onnx'
+
+# Sample comments used to compare the ONNX model against the torch pipeline
+PARITY_SAMPLES = [
+    "This video is amazing! I love it so much!",
+    "I can't believe they cancelled the show, this is so sad.",
+    "This makes me furious, what a waste of time.",
+    "Honestly that jump scare terrified me",
+    "Wait, what?! I did not see that coming",
+    "Ugh, that's disgusting, why would anyone eat that",
+    "The tutorial starts at 2:30",
+    "first!",
+    "Thank you for explaining this so clearly, it really helped",
+    "I miss the old days when this channel posted every week",
+    "Who else is watching this in 2024?",
+    "Stop spreading misinformation, this is wrong and dangerous",
+    "I'm scared for what happens in the next episode",
+    "lol this is hilarious 😂😂",
+    "Nobody asked for this update, it ruined everything",
+    "My grandmother passed away last week and this song was her favorite"
+]
+
+def export_onnx(model_name, output_dir=DEFAULT_MODEL_DIR, quantize=True, opset=14):
+    """Export a Hugging Face sequence classifier to ONNX, optionally with dynamic int8 quantization.
+
+    Returns:
+        str: Path of the model file the runtime should load
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    dummy = tokenizer(["export sample"], return_tensors='pt')
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy['input_ids'], dummy['attention_mask']),
+            fp32_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['logits'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'logits': {0: 'batch'}
+            },
+            opset_version=opset
+        )
+
+    tokenizer.save_pretrained(output_dir)
+    labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+    with open(os.path.join(output_dir, 'labels.json'), 'w') as f:
+        json.dump({'model': model_name, 'labels': labels, 'quantized': quantize}, f)
+
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    int8_path = os.path.join(output_dir, INT8_FILE)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+class OnnxEmotionClassifier:
+    """ONNX Runtime classifier that is called like the transformers pipeline.
+
+    Returns one list of {'label', 'score'} dicts per text, in label order,
+    matching text-classification with return_all_scores=True.
+    """
+
+    def __init__(self, model_dir=DEFAULT_MODEL_DIR, num_threads=None):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, 'labels.json'), 'r') as f:
+            metadata = json.load(f)
+        self.labels = metadata['labels']
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        model_file = INT8_FILE if os.path.exists(os.path.join(model_dir, INT8_FILE)) else FP32_FILE
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, model_file),
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, inputs, batch_size=None, truncation=True, max_length=None, **kwargs):
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        batch_size = batch_size or len(texts) or 1
+        max_length = max_length or min(self.tokenizer.model_max_length, 512)
+
+        results = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=truncation,
+                max_length=max_length,
+                return_tensors='np'
+            )
+            feed = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            logits = self.session.run(['logits'], feed)[0]
+            scores = np.exp(logits - logits.max(axis=1, keepdims=True))
+            scores /= scores.sum(axis=1, keepdims=True)
+            results.extend(
+                [{'label': label, 'score': float(score)} for label, score in zip(self.labels, row)]
+                for row in scores
+            )
+        return results
+
+def check_parity(reference, candidate, texts=None):
+    """Compare top labels and scores of two classifiers on sample texts.
+
+    Returns:
+        dict: Label agreement rate, max absolute score difference and disagreements
+    """
+    texts = texts or PARITY_SAMPLES
+    expected = reference(texts, batch_size=len(texts), truncation=True)
+    actual = candidate(texts, batch_size=len(texts), truncation=True)
+
+    agree = 0
+    max_diff = 0.0
+    disagreements = []
+    for text, ref, cand in zip(texts, expected, actual):
+        ref_scores = {p['label']: p['score'] for p in ref}
+        cand_scores = {p['label']: p['score'] for p in cand}
+        ref_top = max(ref_scores, key=ref_scores.get)
+        cand_top = max(cand_scores, key=cand_scores.get)
+        if ref_top == cand_top:
+            agree += 1
+        else:
+            disagreements.append({'text': text, 'expected': ref_top, 'actual': cand_top})
+        max_diff = max(max_diff, max(abs(ref_scores[label] - cand_scores.get(label, 0.0)) for label in ref_scores))
+
+    return {
+        'samples': len(texts),
+        'labelAgreement': agree / len(texts) if texts else 1.0,
+        'maxScoreDiff': max_diff,
+        'disagreements': disagreements
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the emotion model to ONNX and check parity with torch')
+    parser.add_argument('--model', default=os.getenv('EMOTION_MODEL', 'j-hartmann/emotion-english-distilroberta-base'))
+    parser.add_argument('--output', default=os.getenv('ONNX_MODEL_DIR', DEFAULT_MODEL_DIR))
+    parser.add_argument('--no-quantize', action='store_true', help='Keep fp32 weights')
+    parser.add_argument('--samples', help='Text file with one parity sample per line')
+    parser.add_argument('--min-agreement', type=float, default=0.95)
+    args = parser.parse_args()
+
+    path = export_onnx(args.model, args.output, quantize=not args.no_quantize)
+    print(f"Exported ONNX model to {path}")
+
+    from transformers import pipeline
+    reference = pipeline("text-classification", model=args.model, return_all_scores=True, device=-1)
+    texts = None
+    if args.samples:
+        with open(args.samples, 'r') as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    report = check_parity(reference, OnnxEmotionClassifier(args.output), texts)
+    print(json.dumps(report, indent=2))
+    if report['labelAgreement'] < args.min_agreement:
+        raise SystemExit(f"Label agreement {report['labelAgreement']:.2%} is below {args.min_agreement:.2%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import base64
+import binascii
+import json
+
+# Sort keys served by keyset pagination, all newest/highest first. Each has a
+# (videoId, key, commentId) and a (videoId, emotion, key, commentId) index.
+CURSOR_SORT_FIELDS = ('publishedAt', 'likeCount', 'emotionConfidence')
+
+class InvalidCursorError(ValueError):
+    """Raised for a cursor that is malformed or belongs to a different query."""
+
+def keyset_sort(sort_by):
+    """Sort spec for a keyset page; commentId breaks ties so the order is total."""
+    return [(sort_by, -1), ('commentId', -1)]
+
+def encode_cursor(sort_by, emotion, last_comment):
+    """Opaque token for the page after `last_comment`."""
+    payload = {
+        's': sort_by,
+        'e': emotion,
+        'v': last_comment.get(sort_by),
+        'id': last_comment['commentId']
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort_by, emotion):
+    """Return the (sort value, commentId) a cursor resumes after.
+
+    The cursor must have been issued for the same sortBy and emotion filter,
+    otherwise the page would silently skip or repeat comments.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value, comment_id = payload['v'], payload['id']
+        cursor_sort, cursor_emotion = payload['s'], payload['e']
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise InvalidCursorError('Malformed cursor')
+
+    if cursor_sort != sort_by or cursor_emotion != emotion:
+        raise InvalidCursorError('Cursor was issued for a different sortBy or emotion filter')
+    return value, comment_id
+
+def keyset_filter(sort_by, value, comment_id):
+    """Query clause for the comments strictly after (value, comment_id) in keyset_sort order."""
+    return {'$or': [
+        {sort_by: {'$lt': value}},
+        {sort_by: value, 'commentId': {'$lt': comment_id}}
+    ]}
\ No newline at end of file
@@ -0,0 +1,142 @@
+import os
+import queue
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+PIPELINE_BATCH_SIZE = int(os.getenv('PIPELINE_BATCH_SIZE', 256))
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 4))
+
+_DONE = object()
+
+class PipelineError(Exception):
+    """Raised when one of the pipeline stages fails."""
+
+class _Stage:
+    """Shared stop flag and first error for the pipeline threads."""
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.error = None
+
+    def fail(self, error):
+        if self.error is None:
+            self.error = error
+        self.stop.set()
+
+    def put(self, q, item):
+        # Block while the queue is full (backpressure), but give up if another stage failed
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, q):
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+def run_pipeline(pages, analyze, save, prepare=None, batch_size=None, queue_size=None,
+                 on_fetched=None, on_analyzed=None, on_saved=None):
+    """Stream comment pages through overlapping fetch, analyze and save stages.
+
+    Args:
+        pages: Iterable yielding lists of comments (e.g. one YouTube API page each)
+        analyze: Callable taking a list of comments and returning analyzed comments
+        save: Callable taking a list of analyzed comments and returning a save summary
+        prepare: Optional callable splitting a batch into (comments to analyze,
+            comments saved as they are, e.g. unchanged ones whose metadata moved)
+        batch_size: Number of comments per analysis batch
+        queue_size: Maximum number of pages/batches buffered between stages
+        on_fetched, on_analyzed, on_saved: Optional callbacks receiving each page/batch/summary
+
+    Returns:
+        dict: Totals of fetched, analyzed, saved and failed comments
+    """
+    batch_size = batch_size or PIPELINE_BATCH_SIZE
+    queue_size = queue_size or PIPELINE_QUEUE_SIZE
+    fetched_pages = queue.Queue(maxsize=queue_size)
+    analyzed_batches = queue.Queue(maxsize=queue_size)
+    stage = _Stage()
+    totals = {'fetched': 0, 'analyzed': 0, 'saved': 0, 'failed': 0}
+
+    def fetch():
+        try:
+            for page in pages:
+                if on_fetched:
+                    on_fetched(page)
+                totals['fetched'] += len(page)
+                if not stage.put(fetched_pages, page):
+                    return
+        except Exception as e:
+            stage.fail(e)
+        finally:
+            stage.put(fetched_pages, _DONE)
+
+    def analyze_batches():
+        def flush(batch):
+            unchanged = []
+            if prepare:
+                batch, unchanged = prepare(batch)
+            analyzed = analyze(batch) if batch else []
+            if analyzed:
+                totals['analyzed'] += len(analyzed)
+                if on_analyzed:
+                    on_analyzed(analyzed)
+            if not analyzed and not unchanged:
+                return True
+            return stage.put(analyzed_batches, analyzed + unchanged)
+
+        try:
+            batch = []
+            while True:
+                page = stage.get(fetched_pages)
+                if page is _DONE:
+                    break
+                batch.extend(page)
+                while len(batch) >= batch_size:
+                    if not flush(batch[:batch_size]):
+                        return
+                    batch = batch[batch_size:]
+            if batch and not stage.stop.is_set():
+                flush(batch)
+        except Exception as e:
+            stage.fail(e)
+        finally:
+            stage.put(analyzed_batches, _DONE)
+
+    threads = [
+        threading.Thread(target=fetch, name='pipeline-fetch', daemon=True),
+        threading.Thread(target=analyze_batches, name='pipeline-analyze', daemon=True)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # The calling thread is the writer stage
+    try:
+        while True:
+            batch = stage.get(analyzed_batches)
+            if batch is _DONE:
+                break
+            summary = save(batch)
+            totals['saved'] += len(batch) - summary['failed']
+            totals['failed'] += summary['failed']
+            if on_saved:
+                on_saved(summary)
+    except Exception as e:
+        stage.fail(e)
+
+    for thread in threads:
+        thread.join()
+
+    if stage.error is not None:
+        raise PipelineError(f"Comment pipeline failed: {str(stage.error)}") from stage.error
+    return totals
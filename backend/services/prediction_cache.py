@@ -0,0 +1,189 @@
+import copy
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from bson import json_util
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Its own untracked file: comments.db is a legacy database checked into the repo
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'prediction_cache.db')
+
+# Part of every key; bump when normalize_text changes so persistent entries
+# stored under the old normalization are no longer served
+CACHE_KEY_VERSION = 2
+
+def normalize_text(text):
+    """Normalize comment text so trivially different copies share a cache entry.
+
+    Only Unicode composition and whitespace are normalized: the emotion model
+    is cased, so "I HATE THIS" and "i hate this" can get different predictions.
+    """
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+def cache_key(text, model_version):
+    """Hash normalized text together with the model identifier."""
+    payload = f"{CACHE_KEY_VERSION}\x00{model_version}\x00{normalize_text(text)}".encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+class SQLiteCacheStore:
+    """Persistent cache tier stored in a local SQLite file.
+
+    The connection is opened on first use and reopened in every process:
+    a SQLite connection must not be carried across fork(), and a preloading
+    server (gunicorn --preload) forks its workers after this store is built.
+    """
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = None
+        self.pid = None
+
+    def _connection(self):
+        """The current process's connection; call with self.lock held."""
+        if self.conn is None or self.pid != os.getpid():
+            # A connection inherited from the parent is abandoned, not closed
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.pid = os.getpid()
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS emotion_predictions (
+                    key TEXT PRIMARY KEY,
+                    model_version TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            self.conn.commit()
+        return self.conn
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        placeholders = ','.join('?' for _ in keys)
+        with self.lock:
+            rows = self._connection().execute(
+                f"SELECT key, result FROM emotion_predictions WHERE key IN ({placeholders})",
+                list(keys)
+            ).fetchall()
+        return {key: json_util.loads(result) for key, result in rows}
+
+    def set_many(self, items, model_version):
+        if not items:
+            return
+        with self.lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO emotion_predictions (key, model_version, result) VALUES (?, ?, ?)",
+                [(key, model_version, json_util.dumps(value)) for key, value in items.items()]
+            )
+            conn.commit()
+
+class MongoCacheStore:
+    """Persistent cache tier stored in a MongoDB collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        docs = self.collection.find({'_id': {'$in': list(keys)}})
+        return {doc['_id']: doc['result'] for doc in docs}
+
+    def set_many(self, items, model_version):
+        if not items:
+            return
+        from pymongo import ReplaceOne
+        self.collection.bulk_write([
+            ReplaceOne({'_id': key}, {'_id': key, 'modelVersion': model_version, 'result': value}, upsert=True)
+            for key, value in items.items()
+        ], ordered=False)
+
+class PredictionCache:
+    """Two-tier cache of emotion predictions: bounded in-process LRU plus optional persistent store."""
+
+    def __init__(self, max_size=10000, persistent=None):
+        self.max_size = max_size
+        self.persistent = persistent
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'persistentHits': 0, 'misses': 0}
+
+    def get_many(self, keys):
+        """Return cached results for the given keys, checking the LRU first."""
+        found = {}
+        missing = []
+        with self.lock:
+            for key in keys:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[key] = copy.deepcopy(self.entries[key])
+                elif key not in missing:
+                    missing.append(key)
+
+        if missing and self.persistent is not None:
+            try:
+                stored = self.persistent.get_many(missing)
+            except Exception as e:
+                print(f"Warning: Error reading persistent prediction cache: {e}")
+                stored = {}
+            with self.lock:
+                for key, value in stored.items():
+                    self._put(key, value)
+                    found[key] = copy.deepcopy(value)
+                self.counters['persistentHits'] += len(stored)
+
+        with self.lock:
+            hits = sum(1 for key in keys if key in found)
+            self.counters['hits'] += hits
+            self.counters['misses'] += len(keys) - hits
+        return found
+
+    def set_many(self, items, model_version):
+        """Store results in the LRU and the persistent tier."""
+        with self.lock:
+            for key, value in items.items():
+                self._put(key, copy.deepcopy(value))
+        if self.persistent is not None:
+            try:
+                self.persistent.set_many(items, model_version)
+            except Exception as e:
+                print(f"Warning: Error writing persistent prediction cache: {e}")
+
+    def _put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'size': len(self.entries),
+                'maxSize': self.max_size,
+                'hitRate': self.counters['hits'] / lookups if lookups else 0.0,
+                'persistentBackend': type(self.persistent).__name__ if self.persistent else None
+            }
+
+def get_persistent_store(db=None):
+    """Build the persistent tier selected by PREDICTION_CACHE_BACKEND ('none', 'sqlite' or 'mongo')."""
+    backend = os.getenv('PREDICTION_CACHE_BACKEND', 'none').lower()
+    if backend == 'sqlite':
+        return SQLiteCacheStore(os.getenv('PREDICTION_CACHE_PATH', DEFAULT_SQLITE_PATH))
+    if backend == 'mongo':
+        if db is None:
+            raise ValueError("MongoDB prediction cache requires a database")
+        return MongoCacheStore(db.prediction_cache)
+    return None
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# YouTube Data API quotas reset at midnight Pacific time; using standard time
+# year-round resets an hour late during DST, which errs on the safe side
+QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+# Quota cost of the API methods we call
+QUOTA_COSTS = {
+    'videos.list': 1,
+    'commentThreads.list': 1,
+    'comments.list': 1
+}
+
+class QuotaExceededError(Exception):
+    """Raised when a request would exceed the daily quota budget."""
+
+class QuotaRateLimiter:
+    """Thread-safe limiter for the YouTube API's per-second rate and daily unit budget.
+
+    The per-second rate is limited per process. The daily budget is counted
+    in `collection` when one is set, one `{_id: day, unitsUsed}` document per
+    day charged with an atomic $inc, so every server process and CLI shares
+    it and it survives restarts; without a collection it is counted in memory.
+    """
+
+    def __init__(self, requests_per_second=10, daily_units=10000, collection=None):
+        self.requests_per_second = requests_per_second
+        self.daily_units = daily_units
+        self.collection = collection
+        self.lock = threading.Lock()
+        self.tokens = float(requests_per_second)
+        self.last_refill = time.monotonic()
+        self.day = self._today()
+        self.units_used = 0
+
+    def _today(self):
+        return datetime.now(QUOTA_TIMEZONE).date()
+
+    def _exhausted(self):
+        return QuotaExceededError(f"Daily YouTube quota budget of {self.daily_units} units exhausted")
+
+    def _charge(self, units):
+        """Charge units to today's budget, or raise QuotaExceededError if it can't take them."""
+        today = self._today()
+        if units > self.daily_units:
+            raise self._exhausted()
+
+        if self.collection is None:
+            with self.lock:
+                if today != self.day:
+                    self.day = today
+                    self.units_used = 0
+                if self.units_used + units > self.daily_units:
+                    raise self._exhausted()
+                self.units_used += units
+            return
+
+        try:
+            # Only matches while the units still fit; a spent day's document
+            # exists, so the upsert then fails on its _id instead
+            doc = self.collection.find_one_and_update(
+                {'_id': today.isoformat(), 'unitsUsed': {'$lte': self.daily_units - units}},
+                {'$inc': {'unitsUsed': units}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            raise self._exhausted()
+        with self.lock:
+            self.day = today
+            self.units_used = doc['unitsUsed']
+
+    def acquire(self, units=1):
+        """Charge a request's units to the daily budget, then block until it may be sent."""
+        self._charge(units)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    float(self.requests_per_second),
+                    self.tokens + (now - self.last_refill) * self.requests_per_second
+                )
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.requests_per_second
+            time.sleep(wait)
+
+    def stats(self):
+        day = self._today()
+        units_used = None
+        if self.collection is not None:
+            try:
+                doc = self.collection.find_one({'_id': day.isoformat()})
+                units_used = doc['unitsUsed'] if doc else 0
+            except Exception as e:
+                print(f"Warning: Error reading YouTube quota usage: {e}")
+        with self.lock:
+            if units_used is None:
+                units_used = self.units_used if day == self.day else 0
+            return {
+                'day': day.isoformat(),
+                'unitsUsed': units_used,
+                'dailyUnits': self.daily_units,
+                'requestsPerSecond': self.requests_per_second,
+                'shared': self.collection is not None
+            }
+
+quota_limiter = QuotaRateLimiter(
+    requests_per_second=float(os.getenv('YOUTUBE_REQUESTS_PER_SECOND', 10)),
+    daily_units=int(os.getenv('YOUTUBE_DAILY_QUOTA', 10000))
+)
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+class LRUResponseStore:
+    """Bounded in-process LRU of serialized responses."""
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+class ResponseCache:
+    """Cache of serialized GET responses keyed by video version and normalized parameters.
+
+    Entries are never invalidated one by one: every write to a video bumps its
+    cacheVersion, so requests after the write build new keys and the old
+    entries age out of the store. The key hash doubles as the ETag, so a
+    matching If-None-Match is answered before anything is read or serialized.
+
+    `store` is any object with get(key) and set(key, value) (e.g. a shared
+    Redis-backed store for multi-process deployments); None disables caching.
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'notModified': 0}
+
+    @property
+    def enabled(self):
+        return self.store is not None
+
+    def key(self, endpoint, video_id, version, params):
+        """Stable key for a response; `params` must already be normalized (defaults filled in)."""
+        payload = json.dumps([endpoint, video_id, version, params], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def etag(self, key):
+        return key
+
+    def get(self, key):
+        value = self.store.get(key) if self.enabled else None
+        self.count('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        try:
+            self.store.set(key, value)
+        except Exception as e:
+            print(f"Warning: Error writing response cache: {e}")
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def clear(self):
+        if self.enabled:
+            self.store.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'size': len(self.store) if self.enabled and hasattr(self.store, '__len__') else None,
+                'maxSize': getattr(self.store, 'max_size', None),
+                'hitRate': self.counters['hits'] / lookups if lookups else 0.0,
+                'backend': type(self.store).__name__ if self.store is not None else None
+            }
+
+def get_response_store():
+    """Build the store selected by RESPONSE_CACHE_BACKEND ('memory' or 'none')."""
+    backend = os.getenv('RESPONSE_CACHE_BACKEND', 'memory').lower()
+    if backend == 'memory':
+        return LRUResponseStore(int(os.getenv('RESPONSE_CACHE_SIZE', 1000)))
+    if backend == 'none':
+        return None
+    raise ValueError(f"Unsupported response cache backend: {backend}")
+
+response_cache = ResponseCache(get_response_store())
\ No newline at end of file
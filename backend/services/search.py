@@ -0,0 +1,88 @@
+import os
+import re
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Largest page a client can ask for, and how deep into the ranked results it can page
+SEARCH_MAX_LIMIT = int(os.getenv('SEARCH_MAX_LIMIT', 100))
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', 1000))
+SEARCH_MAX_QUERY_LENGTH = 200
+
+SEARCH_MODES = ('text', 'regex')
+
+class InvalidSearchError(ValueError):
+    """Raised for a search request that cannot be run (bad mode, query or pattern)."""
+
+def _page_bounds(page, limit):
+    limit = min(max(int(limit), 1), SEARCH_MAX_LIMIT)
+    page = max(int(page), 1)
+    skip = (page - 1) * limit
+    return page, limit, skip
+
+def _build_query(video_id, query, emotion, mode):
+    if mode not in SEARCH_MODES:
+        raise InvalidSearchError(f"Unsupported search mode: {mode}")
+    if not query or len(query) > SEARCH_MAX_QUERY_LENGTH:
+        raise InvalidSearchError(f"Search query must be 1-{SEARCH_MAX_QUERY_LENGTH} characters")
+
+    filters = {'videoId': video_id}
+    if mode == 'text':
+        filters['$text'] = {'$search': query}
+    else:
+        try:
+            re.compile(query)
+        except re.error as e:
+            raise InvalidSearchError(f"Invalid regular expression: {e}")
+        filters['text'] = {'$regex': query, '$options': 'i'}
+
+    if emotion:
+        filters['emotion'] = emotion
+    return filters
+
+def search_comments(collection, video_id, query, emotion=None, page=1, limit=20, mode='text'):
+    """Search a video's comments.
+
+    'text' mode runs $text on the compound text index and ranks matches by
+    relevance (stemmed words and "quoted phrases", see MongoDB's $search
+    syntax). 'regex' mode runs the query as a case-insensitive regular
+    expression; it cannot use an index and scans every comment of the video,
+    so clients have to ask for it explicitly. Both modes stop counting and
+    paging at SEARCH_MAX_RESULTS matches.
+
+    Returns:
+        dict: comments (with a relevance `score` in text mode) and pagination
+    """
+    filters = _build_query(video_id, query, emotion, mode)
+    page, limit, skip = _page_bounds(page, limit)
+
+    if skip >= SEARCH_MAX_RESULTS:
+        comments = []
+    else:
+        projection = {'_id': 0}
+        if mode == 'text':
+            projection['score'] = {'$meta': 'textScore'}
+            sort = [('score', {'$meta': 'textScore'}), ('commentId', -1)]
+        else:
+            sort = [('publishedAt', -1), ('commentId', -1)]
+        comments = list(
+            collection.find(filters, projection)
+            .sort(sort)
+            .skip(skip)
+            .limit(min(limit, SEARCH_MAX_RESULTS - skip))
+        )
+
+    # Counting stops at the cap, so a broad query costs at most SEARCH_MAX_RESULTS index entries
+    total = collection.count_documents(filters, limit=SEARCH_MAX_RESULTS)
+    return {
+        'comments': comments,
+        'mode': mode,
+        'pagination': {
+            'page': page,
+            'limit': limit,
+            'total': total,
+            'totalPages': (total + limit - 1) // limit,
+            'capped': total >= SEARCH_MAX_RESULTS
+        }
+    }
\ No newline at end of file
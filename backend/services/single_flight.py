@@ -0,0 +1,147 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+class IngestLease:
+    """Lease on a video's ingestion, one document per video keyed by `_id: videoId`.
+
+    Acquiring upserts that document; _id is always unique, so two processes
+    cannot both create it, whatever indexes exist. The holder renews the
+    lease while it works; a crashed holder's lease expires after
+    `ttl_seconds` and can be taken over.
+    """
+
+    def __init__(self, collection, video_id, owner, ttl_seconds=300):
+        self.collection = collection
+        self.video_id = video_id
+        self.owner = owner
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.stop = threading.Event()
+        self.heartbeat = None
+
+    def acquire(self):
+        """Take the lease if it is free, expired or already ours."""
+        now = datetime.utcnow()
+        try:
+            self.collection.update_one(
+                {
+                    '_id': self.video_id,
+                    '$or': [
+                        {'owner': None},
+                        {'expiresAt': {'$lt': now}},
+                        {'owner': self.owner}
+                    ]
+                },
+                {'$set': {'owner': self.owner, 'acquiredAt': now, 'expiresAt': now + self.ttl}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # The document exists with someone else's live lease
+            return False
+
+    def renew(self):
+        result = self.collection.update_one(
+            {'_id': self.video_id, 'owner': self.owner},
+            {'$set': {'expiresAt': datetime.utcnow() + self.ttl}}
+        )
+        if result.matched_count == 0:
+            print(f"Warning: Lost ingest lease for video {self.video_id}")
+
+    def release(self, completed=False):
+        """Give up the lease, recording a finished ingestion for the processes waiting on it."""
+        self.stop.set()
+        update = {'$unset': {'owner': '', 'acquiredAt': '', 'expiresAt': ''}}
+        if completed:
+            update['$set'] = {'completedAt': datetime.utcnow()}
+        self.collection.update_one({'_id': self.video_id, 'owner': self.owner}, update)
+
+    def _renew_until_released(self):
+        interval = self.ttl.total_seconds() / 3
+        while not self.stop.wait(interval):
+            try:
+                self.renew()
+            except Exception as e:
+                print(f"Warning: Error renewing ingest lease for video {self.video_id}: {e}")
+
+    def __enter__(self):
+        self.heartbeat = threading.Thread(
+            target=self._renew_until_released, name=f"lease-{self.video_id}", daemon=True
+        )
+        self.heartbeat.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release(completed=exc_type is None)
+
+class SingleFlight:
+    """Coalesce concurrent ingestions of the same video across processes.
+
+    Within a process the job queue already hands concurrent requests the
+    same job (counted with `joined`). Across processes the first job to take
+    the video's lease runs the ingestion; the others wait for the lease to
+    be released and, if the holder finished the sync, complete with its
+    result instead of fetching and analyzing the video again. If the holder
+    failed or died, the next waiter takes over.
+    """
+
+    def __init__(self, collection, ttl_seconds=300, poll_seconds=1.0):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.poll_seconds = poll_seconds
+        self.lock = threading.Lock()
+        self.counters = {'leaders': 0, 'joined': 0, 'shared': 0, 'takeovers': 0, 'waiting': 0, 'waitSeconds': 0.0}
+
+    def count(self, counter, value=1):
+        with self.lock:
+            self.counters[counter] += value
+
+    def owner(self, key):
+        return f"{socket.gethostname()}:{os.getpid()}:{key}"
+
+    def _lease_state(self, video_id):
+        return self.collection.find_one({'_id': video_id}) or {}
+
+    def run(self, video_id, func, key):
+        """Run func() as the video's only ingestion, or wait for the one in progress.
+
+        Returns func's result, or None when another process's ingestion was shared.
+        """
+        waited = False
+        while True:
+            completed_before = self._lease_state(video_id).get('completedAt')
+            lease = IngestLease(self.collection, video_id, self.owner(key), self.ttl_seconds)
+            if lease.acquire():
+                self.count('takeovers' if waited else 'leaders')
+                with lease:
+                    return func()
+
+            # Someone else is ingesting this video: wait for it to let go
+            print(f"Waiting for the running ingestion of video {video_id}")
+            waited = True
+            started = time.monotonic()
+            self.count('waiting')
+            try:
+                while True:
+                    time.sleep(self.poll_seconds)
+                    state = self._lease_state(video_id)
+                    if not state.get('owner') or state['expiresAt'] < datetime.utcnow():
+                        break
+            finally:
+                self.count('waiting', -1)
+                self.count('waitSeconds', time.monotonic() - started)
+
+            if state.get('completedAt') and state.get('completedAt') != completed_before:
+                self.count('shared')
+                return None
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""Per-video emotion rollups kept in the video_stats collection.
+
+Rollups are updated incrementally by save_comments, so reading a video's
+emotion statistics is one indexed find_one instead of an aggregation over
+all of its comments. Backfill or repair them with:
+
+    python -m services.video_stats --all
+    python -m services.video_stats --video-id VIDEO_ID
+"""
+import argparse
+import traceback
+from collections import defaultdict
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Confidence histogram buckets of width 0.1
+HISTOGRAM_BUCKETS = 10
+
+STATS_FIELDS = {'_id': 0, 'commentId': 1, 'emotion': 1, 'emotionConfidence': 1, 'publishedAt': 1}
+
+def _day(published_at):
+    if isinstance(published_at, datetime):
+        return published_at.strftime('%Y-%m-%d')
+    return str(published_at)[:10] if published_at else 'unknown'
+
+def _contribute(delta, comment, sign):
+    """Add (sign=1) or remove (sign=-1) one comment's share of the rollup counters."""
+    emotion = str(comment.get('emotion') or 'unknown').replace('.', '_').lstrip('$')
+    confidence = float(comment.get('emotionConfidence') or 0.0)
+    bucket = min(max(int(confidence * HISTOGRAM_BUCKETS), 0), HISTOGRAM_BUCKETS - 1)
+
+    delta['total'] += sign
+    delta[f'emotions.{emotion}.count'] += sign
+    delta[f'emotions.{emotion}.confidenceSum'] += sign * confidence
+    delta[f'emotions.{emotion}.histogram.{bucket}'] += sign
+    delta[f'days.{_day(comment.get("publishedAt"))}.{emotion}'] += sign
+
+def rollup_delta(previous, comments):
+    """Counter changes from writing `comments` over the stored `previous` versions.
+
+    Args:
+        previous (dict): Stored comment documents by commentId (only those that existed)
+        comments (list): Comments as written; fields they omit keep their stored value
+
+    Returns:
+        dict: Dotted field path -> increment, without zero entries
+    """
+    delta = defaultdict(int)
+    for comment in comments:
+        old = previous.get(comment['commentId'])
+        if old is not None:
+            _contribute(delta, old, -1)
+            _contribute(delta, {**old, **comment}, 1)
+        else:
+            _contribute(delta, comment, 1)
+    return {path: value for path, value in delta.items() if value != 0}
+
+def apply_delta(db, video_id, delta):
+    """Apply counter changes to the video's rollup in one atomic $inc.
+
+    Without a rollup (a new video, or one stored before rollups existed) the
+    $inc would start from zero and hold only this batch, so the rollup is
+    rebuilt from the stored comments instead, which already include it.
+    """
+    if not delta:
+        return
+    result = db.video_stats.update_one(
+        {'videoId': video_id},
+        {'$inc': delta, '$set': {'updatedAt': datetime.utcnow()}}
+    )
+    if result.matched_count == 0:
+        rebuild_video_stats(db, video_id)
+
+def _nest(flat):
+    """Turn dotted paths into the nested document Mongo would build from them."""
+    doc = {}
+    for path, value in flat.items():
+        node = doc
+        *parents, leaf = path.split('.')
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return doc
+
+def rebuild_video_stats(db, video_id):
+    """Recompute a video's rollup from its stored comments and replace the stored one.
+
+    Run it while the video is not being ingested; increments applied
+    during the rebuild would be overwritten.
+    """
+    delta = defaultdict(int)
+    delta['total'] = 0
+    for comment in db.comments.find({'videoId': video_id}, STATS_FIELDS).batch_size(5000):
+        _contribute(delta, comment, 1)
+
+    rollup = {
+        **_nest({path: value for path, value in delta.items() if value != 0 or path == 'total'}),
+        'videoId': video_id,
+        'updatedAt': datetime.utcnow()
+    }
+    db.video_stats.replace_one({'videoId': video_id}, rollup, upsert=True)
+    return rollup
+
+def get_video_stats(db, video_id, rebuild_missing=True):
+    """Read a video's rollup, building it once if the video predates rollups.
+
+    Pass rebuild_missing=False while the video is being ingested: the
+    ingestion's first save builds the rollup, and a concurrent rebuild could
+    overwrite its increments.
+    """
+    rollup = db.video_stats.find_one({'videoId': video_id}, {'_id': 0})
+    if rollup is None and rebuild_missing:
+        print(f"No emotion rollup for video {video_id}, rebuilding from comments")
+        rollup = rebuild_video_stats(db, video_id)
+    return rollup
+
+def emotion_stats(rollup):
+    """Per-emotion count, average confidence and confidence histogram of a rollup."""
+    stats = {}
+    for emotion, values in ((rollup or {}).get('emotions') or {}).items():
+        count = int(values.get('count', 0))
+        if count <= 0:
+            continue
+        histogram = values.get('histogram') or {}
+        stats[emotion] = {
+            'count': count,
+            'avgConfidence': values.get('confidenceSum', 0.0) / count,
+            'confidenceHistogram': [int(histogram.get(str(b), 0)) for b in range(HISTOGRAM_BUCKETS)]
+        }
+    return stats
+
+def emotion_timeline(rollup):
+    """Comment counts per publish day and emotion, oldest day first."""
+    days = (rollup or {}).get('days') or {}
+    return {
+        day: {emotion: int(count) for emotion, count in counts.items() if count > 0}
+        for day, counts in sorted(days.items())
+        if any(count > 0 for count in counts.values())
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild per-video emotion rollups from stored comments')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--video-id', help='Rebuild one video')
+    group.add_argument('--all', action='store_true', help='Rebuild every video with comments')
+    args = parser.parse_args()
+
+    from config.mongodb import get_database, setup_indexes
+    db = get_database()
+    setup_indexes(db)
+
+    video_ids = [args.video_id] if args.video_id else db.comments.distinct('videoId')
+    for video_id in video_ids:
+        try:
+            rollup = rebuild_video_stats(db, video_id)
+            print(f"Rebuilt rollup for {video_id}: {int(rollup['total'])} comments")
+        except Exception as e:
+            print(f"Error rebuilding rollup for {video_id}: {str(e)}")
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,161 @@
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+import httplib2
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
+from services.quota import QUOTA_COSTS, quota_limiter
 
 # Load environment variables
 load_dotenv()
 
-def get_youtube_client():
-    """Get authenticated YouTube client."""
+DISCOVERY_CACHE_PATH = os.getenv(
+    'YOUTUBE_DISCOVERY_CACHE',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'youtube_v3_discovery.json')
+)
+HTTP_TIMEOUT = int(os.getenv('YOUTUBE_HTTP_TIMEOUT', 30))
+HTTP_RETRIES = int(os.getenv('YOUTUBE_HTTP_RETRIES', 2))
+FETCH_WORKERS = int(os.getenv('YOUTUBE_FETCH_WORKERS', 8))
+FETCH_REPLIES = os.getenv('FETCH_REPLIES', 'true').lower() == 'true'
+# Reply caps, so a few huge threads can't spend the daily quota
+MAX_REPLIES_PER_THREAD = int(os.getenv('MAX_REPLIES_PER_THREAD', 100))
+MAX_REPLIES = int(os.getenv('MAX_REPLIES', 1000))
+
+_client = None
+_client_lock = threading.Lock()
+_local = threading.local()
+_executor = None
+
+def get_http():
+    """Get this thread's keep-alive HTTP connection pool.
+
+    httplib2.Http is not thread-safe, so each thread reuses its own instance.
+    """
+    http = getattr(_local, 'http', None)
+    if http is None:
+        http = httplib2.Http(timeout=HTTP_TIMEOUT)
+        _local.http = http
+    return http
+
+class PooledHttpRequest(HttpRequest):
+    """HttpRequest that executes on the calling thread's pooled connection."""
+
+    def execute(self, http=None, num_retries=HTTP_RETRIES):
+        return super().execute(http=http or get_http(), num_retries=num_retries)
+
+def load_discovery_document():
+    """Load the YouTube discovery document from the local cache file, creating it if needed."""
+    if os.path.exists(DISCOVERY_CACHE_PATH):
+        with open(DISCOVERY_CACHE_PATH, 'r') as f:
+            return f.read()
+
+    document = get_static_doc('youtube', 'v3')
+    if document:
+        try:
+            with open(DISCOVERY_CACHE_PATH, 'w') as f:
+                f.write(document)
+        except OSError as e:
+            print(f"Warning: Could not write discovery cache: {e}")
+    return document
+
+def create_youtube_client():
+    """Build a YouTube client that shares pooled HTTP connections."""
     api_key = os.getenv('YOUTUBE_API_KEY')
     if not api_key:
         raise ValueError("YouTube API key not found in environment variables")
-    return build('youtube', 'v3', developerKey=api_key)
+
+    document = load_discovery_document()
+    if document:
+        return build_from_document(
+            document,
+            developerKey=api_key,
+            http=get_http(),
+            requestBuilder=PooledHttpRequest
+        )
+    return build('youtube', 'v3', developerKey=api_key, http=get_http(), requestBuilder=PooledHttpRequest)
+
+def get_youtube_client():
+    """Get the shared, long-lived YouTube client."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_youtube_client()
+    return _client
+
+def set_youtube_client(client):
+    """Replace the shared client, e.g. with a local stub in tests. Pass None to rebuild it."""
+    global _client
+    with _client_lock:
+        _client = client
+
+def get_executor():
+    """Get the bounded thread pool used for concurrent API requests."""
+    global _executor
+    if _executor is None:
+        with _client_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='youtube-fetch')
+    return _executor
+
+def execute(request, method):
+    """Execute an API request once the rate limiter allows it."""
+    quota_limiter.acquire(QUOTA_COSTS.get(method, 1))
+    return request.execute()
+
+def parse_comment(comment_id, snippet, parent_id=None):
+    """Convert a comment resource snippet into our comment format."""
+    comment = {
+        'commentId': comment_id,
+        'text': snippet['textDisplay'],
+        'author': snippet['authorDisplayName'],
+        'authorChannelId': snippet.get('authorChannelId', {}).get('value'),
+        'likeCount': snippet.get('likeCount', 0),
+        'publishedAt': snippet['publishedAt'],
+    }
+    if parent_id:
+        comment['parentId'] = parent_id
+    return comment
+
+def fetch_comment_replies(parent_id, max_replies=MAX_REPLIES_PER_THREAD):
+    """Fetch up to `max_replies` replies to a top-level comment."""
+    try:
+        youtube = get_youtube_client()
+        replies = []
+        next_page_token = None
+
+        while len(replies) < max_replies:
+            response = execute(youtube.comments().list(
+                part='snippet',
+                parentId=parent_id,
+                maxResults=min(100, max_replies - len(replies)),
+                pageToken=next_page_token,
+                textFormat='plainText'
+            ), 'comments.list')
+
+            for item in response['items'][:max_replies - len(replies)]:
+                replies.append(parse_comment(item['id'], item['snippet'], parent_id))
+
+            next_page_token = response.get('nextPageToken')
+            if not next_page_token:
+                break
+
+        return replies
+    except HttpError as e:
+        raise Exception(f"YouTube API error: {str(e)}")
 
 def fetch_video_info(video_id):
     """Fetch video information from YouTube."""
     try:
         youtube = get_youtube_client()
-        response = youtube.videos().list(
+        response = execute(youtube.videos().list(
             part='snippet,statistics',
             id=video_id
-        ).execute()
+        ), 'videos.list')
 
         if not response.get('items'):
             raise ValueError('Video not found')
@@ -45,40 +179,81 @@ def fetch_video_info(video_id):
     except HttpError as e:
         raise Exception(f"YouTube API error: {str(e)}")
 
-def fetch_video_comments(video_id, max_comments=100):
-    """Fetch comments from YouTube."""
+def iter_video_comment_pages(video_id, max_comments=100, since=None, include_replies=None):
+    """Yield pages of comments from YouTube, newest first, as the API returns them.
+
+    `max_comments` limits the number of top-level comments. If `since` (an ISO
+    timestamp) is given, paging stops at the first top-level comment published
+    at or before it. With `include_replies`, each page also contains the replies
+    to its threads; threads with more replies than the API inlines are expanded
+    in parallel. Replies are capped at MAX_REPLIES_PER_THREAD per thread and
+    MAX_REPLIES per call.
+    """
+    if include_replies is None:
+        include_replies = FETCH_REPLIES
+
     try:
         youtube = get_youtube_client()
-        comments = []
+        fetched = 0
+        reply_budget = MAX_REPLIES
         next_page_token = None
+        reached_watermark = False
 
         while True:
-            request = youtube.commentThreads().list(
-                part='snippet',
+            response = execute(youtube.commentThreads().list(
+                part='snippet,replies' if include_replies else 'snippet',
                 videoId=video_id,
-                maxResults=min(100, max_comments - len(comments)),
+                maxResults=min(100, max_comments - fetched),
                 pageToken=next_page_token,
+                order='time',
                 textFormat='plainText'
-            )
-            response = request.execute()
+            ), 'commentThreads.list')
 
+            comments = []
+            pending_replies = []
             for item in response['items']:
                 comment = item['snippet']['topLevelComment']['snippet']
-                comments.append({
-                    'commentId': item['id'],
-                    'text': comment['textDisplay'],
-                    'author': comment['authorDisplayName'],
-                    'authorChannelId': comment.get('authorChannelId', {}).get('value'),
-                    'likeCount': comment.get('likeCount', 0),
-                    'publishedAt': comment['publishedAt'],
-                })
+                if since and comment['publishedAt'] <= since:
+                    reached_watermark = True
+                    break
+                comments.append(parse_comment(item['id'], comment))
+                fetched += 1
+
+                if include_replies and reply_budget > 0:
+                    inline = item.get('replies', {}).get('comments', [])
+                    wanted = min(item['snippet'].get('totalReplyCount', 0), MAX_REPLIES_PER_THREAD, reply_budget)
+                    reply_budget -= wanted
+                    if wanted > len(inline):
+                        pending_replies.append(get_executor().submit(fetch_comment_replies, item['id'], wanted))
+                    else:
+                        comments.extend(
+                            parse_comment(reply['id'], reply['snippet'], item['id'])
+                            for reply in inline[:wanted]
+                        )
+
+            for future in pending_replies:
+                comments.extend(future.result())
+
+            if comments:
+                yield comments
 
             next_page_token = response.get('nextPageToken')
-            if not next_page_token or len(comments) >= max_comments:
+            if reached_watermark or not next_page_token or fetched >= max_comments:
                 break
-
-        return comments
     except HttpError as e:
         if "commentsDisabled" in str(e):
             raise Exception("Comments are disabled for this video")
-        raise Exception(f"YouTube API error: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"YouTube API error: {str(e)}")
+
+def fetch_video_comments(video_id, max_comments=100, since=None, include_replies=None):
+    """Fetch comments from YouTube, newest first, into a single list."""
+    return [
+        comment
+        for page in iter_video_comment_pages(
+            video_id,
+            max_comments=max_comments,
+            since=since,
+            include_replies=include_replies
+        )
+        for comment in page
+    ]
\ No newline at end of file
@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+from config.mongodb import get_database
+from nlp.emotion_classifier import EmotionClassifier
+from nlp.feature_extractor import FeatureExtractor
+from nlp.preprocessor import TextPreprocessor
+from nlp.training import train_out_of_core
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the classical emotion classifier on all stored comments')
+    parser.add_argument('--model', default='sgd', choices=EmotionClassifier.INCREMENTAL_MODELS)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--n-features', type=int, default=2 ** 20)
+    parser.add_argument('--checkpoint', default='checkpoints/emotion', help='Path prefix for checkpoints')
+    parser.add_argument('--checkpoint-every', type=int, default=10, help='Chunks between checkpoints')
+    parser.add_argument('--video-id', help='Only train on one video\'s comments')
+    parser.add_argument('--preprocess', choices=['none', 'spacy', 'nltk'], default='none',
+                        help='Lemmatize comments before vectorizing')
+    parser.add_argument('--preprocess-workers', type=int, default=0,
+                        help='Preprocessing worker processes (0 uses every core)')
+    parser.add_argument('--artifact', help='Also export memory-mappable artifacts to this directory')
+    args = parser.parse_args()
+
+    db = get_database()
+    extractor = FeatureExtractor(method='hashing', n_features=args.n_features)
+    classifier = EmotionClassifier(args.model)
+    preprocessor = None
+    if args.preprocess != 'none':
+        preprocessor = TextPreprocessor(
+            use_spacy=args.preprocess == 'spacy',
+            workers=args.preprocess_workers
+        )
+
+    print(f"Training {args.model} on db.comments in chunks of {args.chunk_size}...")
+    try:
+        metrics = train_out_of_core(
+            db.comments,
+            classifier,
+            extractor=extractor,
+            preprocessor=preprocessor,
+            chunk_size=args.chunk_size,
+            query={'videoId': args.video_id} if args.video_id else None,
+            checkpoint_path=args.checkpoint,
+            checkpoint_every=args.checkpoint_every
+        )
+    finally:
+        if preprocessor is not None:
+            preprocessor.close()
+    extractor.save(args.checkpoint)
+    if args.artifact:
+        classifier.save_artifact(os.path.join(args.artifact, 'classifier'))
+        extractor.save_artifact(os.path.join(args.artifact, 'features'))
+        print(f"Exported artifacts to {args.artifact}")
+
+    print(json.dumps(metrics, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,26 @@ import 'react-toastify/dist/ReactToastify.css';
 import { debounce } from 'lodash';
 import Spline from '@splinetool/react-spline';
 
+const API_URL = 'http://localhost:5000';
+
+// Poll an analysis job until it finishes
+const waitForJob = async (jobId, interval = 1000) => {
+  while (true) {
+    const response = await fetch(`${API_URL}/jobs/${jobId}`);
+    if (!response.ok) {
+      throw new Error('Failed to check analysis progress. Please try again later.');
+    }
+    const job = await response.json();
+    if (job.status === 'completed') {
+      return job;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Analysis failed. Please try again later.');
+    }
+    await new Promise((resolve) => setTimeout(resolve, interval));
+  }
+};
+
 function App() {
   const [comments, setComments] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -29,7 +49,14 @@ function App() {
           throw new Error('Invalid YouTube URL. Please ensure it includes a valid video ID.');
         }
 
-        const response = await fetch(`http://localhost:5000/comments?videoId=${videoId}&limit=0`);
+        const commentsUrl = `${API_URL}/comments?videoId=${videoId}&limit=0`;
+        let response = await fetch(commentsUrl);
+        if (response.status === 202) {
+          // The video is being analyzed in the background
+          const { jobId } = await response.json();
+          await waitForJob(jobId);
+          response = await fetch(commentsUrl);
+        }
         if (!response.ok) {
           throw new Error(
             response.status === 404